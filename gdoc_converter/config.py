@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .exceptions import ConfigurationError
 
 logger = logging.getLogger(__name__)
@@ -87,6 +87,16 @@ class Config:
     def max_concurrent_downloads(self) -> int:
         return self.data['network']['max_concurrent_image_downloads']
 
+    @property
+    def max_concurrent_downloads_per_host(self) -> Optional[int]:
+        # Optional setting, None means the same limit as max_concurrent_downloads
+        return self.data['network'].get('max_concurrent_image_downloads_per_host')
+
+    @property
+    def max_concurrent_documents(self) -> int:
+        # Optional setting, configs without it process one document at a time
+        return self.data['network'].get('max_concurrent_documents', 1)
+
     # --- Logging ---
     @property
     def log_level(self) -> str:
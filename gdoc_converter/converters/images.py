@@ -1,26 +1,49 @@
 import os
+import shutil
 import logging
 import asyncio
 import aiohttp
-import requests
+from itertools import count
+from typing import Optional
 from ..config import Config
 
 logger = logging.getLogger(__name__)
 
+# Bytes read from the response per iteration, and bytes buffered before each disk write
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Filled buffers allowed to wait for the writer before the download pauses
+WRITE_QUEUE_SIZE = 4
+
+# Image hosts are resolved once per document's session and idle connections are kept for reuse
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
+
+# Shared by all synchronous downloads so keep-alive connections are reused
+_sync_session = None
+
 
 class ImageDownloadManager:
     """Async image download manager"""
 
-    def __init__(self, config: Config):
-        self.max_concurrent = config.max_concurrent_downloads
+    def __init__(self, config: Config, max_concurrent: Optional[int] = None):
+        self.max_concurrent = max_concurrent or config.max_concurrent_downloads
+        self.max_concurrent_per_host = min(config.max_concurrent_downloads_per_host or self.max_concurrent,
+                                           self.max_concurrent)
         self.timeout_seconds = config.request_timeout
-        self.semaphore = asyncio.Semaphore(self.max_concurrent)
         self.session = None
 
     async def __aenter__(self):
         """Async context manager entry"""
-        connector = aiohttp.TCPConnector(limit=self.max_concurrent)
-        timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
+        # The connector pool is the only concurrency limit: downloads beyond it wait for a free connection.
+        # Each document opens its own session even though the whole batch runs on one event loop, because
+        # the limits (max_concurrent differs between standard and chunked documents, plus the per-host cap)
+        # are connector settings and must apply per document, not across all documents converting at once
+        connector = aiohttp.TCPConnector(limit=self.max_concurrent, limit_per_host=self.max_concurrent_per_host,
+                                         ttl_dns_cache=DNS_CACHE_TTL, keepalive_timeout=KEEPALIVE_TIMEOUT)
+        # Per-socket timeouts, so time spent queued for a pooled connection doesn't count against a download
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout_seconds,
+                                        sock_read=self.timeout_seconds)
         self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
         return self
 
@@ -34,25 +57,40 @@ class ImageDownloadManager:
         Asynchronously download a single image
         (Original logic copied)
         """
-        async with self.semaphore:
-            try:
-                async with self.session.get(url) as response:
-                    response.raise_for_status()
-                    file_path = os.path.join(dest_folder, filename)
-                    with open(file_path, 'wb') as f:
-                        async for chunk in response.content.iter_chunked(8192):
-                            f.write(chunk)
-                    logger.debug(f"Successfully downloaded image: {filename}")
-                    return True
-            except aiohttp.ClientError as e:
-                logger.error(f"Failed to download image from {url}: {e}")
-                return False
-            except IOError as e:
-                logger.error(f"Failed to save image {filename}: {e}")
-                return False
-            except Exception as e:
-                logger.error(f"Unexpected error downloading {filename}: {e}")
-                return False
+        try:
+            async with self.session.get(url) as response:
+                response.raise_for_status()
+                file_path = os.path.join(dest_folder, filename)
+                with open(file_path, 'wb') as f:
+                    # Buffers are handed to a writer task, so the next one downloads while the last is written
+                    queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+                    writer = asyncio.create_task(_write_buffers(queue, f))
+                    try:
+                        buffer = bytearray()
+                        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            buffer += chunk
+                            if len(buffer) >= WRITE_BUFFER_SIZE:
+                                await queue.put(buffer)
+                                buffer = bytearray()
+                        if buffer:
+                            await queue.put(buffer)
+                    finally:
+                        # Always let the writer finish before the file is closed. If it died
+                        # (only possible by cancellation) nobody would take the None off a full queue
+                        if not writer.done():
+                            await queue.put(None)
+                        await writer
+                logger.debug(f"Successfully downloaded image: {filename}")
+                return True
+        except aiohttp.ClientError as e:
+            logger.error(f"Failed to download image from {url}: {e}")
+            return False
+        except IOError as e:
+            logger.error(f"Failed to save image {filename}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error downloading {filename}: {e}")
+            return False
 
     async def download_images_batch(self, download_tasks):
         """
@@ -62,35 +100,73 @@ class ImageDownloadManager:
         if not download_tasks:
             return {}
         logger.info(f"Starting batch download of {len(download_tasks)} images...")
-        tasks = []
-        for url, dest_folder, filename in download_tasks:
-            task = self.download_image(url, dest_folder, filename)
-            tasks.append((filename, task))
-
         results = {}
-        completed_tasks = await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
+        pending = iter(download_tasks)
 
-        for (filename, _), result in zip(tasks, completed_tasks):
-            if isinstance(result, Exception):
-                logger.error(f"Exception during download of {filename}: {result}")
-                results[filename] = False
-            else:
-                results[filename] = result
+        async def worker():
+            # Workers pull from the shared iterator, so only max_concurrent downloads exist at any time
+            for url, dest_folder, filename in pending:
+                try:
+                    results[filename] = await self.download_image(url, dest_folder, filename)
+                except Exception as e:
+                    logger.error(f"Exception during download of {filename}: {e}")
+                    results[filename] = False
+
+        await asyncio.gather(*(worker() for _ in range(min(self.max_concurrent, len(download_tasks)))))
 
         successful_downloads = sum(1 for success in results.values() if success)
         logger.info(f"Completed batch download: {successful_downloads}/{len(download_tasks)} successful")
         return results
 
 
+def _get_sync_session():
+    """Create the shared requests session on first use"""
+    global _sync_session
+    if _sync_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        _sync_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+        _sync_session.mount('http://', adapter)
+        _sync_session.mount('https://', adapter)
+    return _sync_session
+
+
+async def _write_buffers(queue, f):
+    """
+    Write buffers from the queue to f in the default executor until None is received.
+    After a failed write (whatever the exception) the queue is still drained, so the downloader
+    never blocks on a full queue; the first error is raised once None arrives.
+    """
+    loop = asyncio.get_running_loop()
+    error = None
+    while True:
+        buffer = await queue.get()
+        if buffer is None:
+            break
+        if error is None:
+            try:
+                await loop.run_in_executor(None, f.write, buffer)
+            except Exception as e:
+                error = e
+    if error is not None:
+        raise error
+
+
 def download_image(url: str, dest_folder: str, filename: str, config: Config):
     """
     Synchronously download an image (for fallback)
     """
+    import requests  # Only the fallback path needs requests, so don't load it for every run
+
     try:
-        response = requests.get(url, timeout=config.request_timeout)  # Use config
-        response.raise_for_status()
-        with open(os.path.join(dest_folder, filename), 'wb') as f:
-            f.write(response.content)
+        with _get_sync_session().get(url, timeout=config.request_timeout, stream=True) as response:  # Use config
+            response.raise_for_status()
+            # Let urllib3 undo any Content-Encoding, then copy the raw stream straight to disk
+            response.raw.decode_content = True
+            with open(os.path.join(dest_folder, filename), 'wb', buffering=DOWNLOAD_CHUNK_SIZE) as f:
+                shutil.copyfileobj(response.raw, f, DOWNLOAD_CHUNK_SIZE)
         logger.debug(f"Successfully downloaded image (sync): {filename}")
         return True
     except requests.RequestException as e:
@@ -101,7 +177,21 @@ def download_image(url: str, dest_folder: str, filename: str, config: Config):
         return False
 
 
-def collect_image_info(elem, inline_objects, img_count_ref, image_prefix=None, use_relative_path=False):
+def get_image_extension(img_url):
+    """Extension of the file named by an image URL (query string ignored), '.png' if missing or implausible"""
+    query_start = img_url.find('?')
+    path = img_url if query_start < 0 else img_url[:query_start]
+    dot = path.rfind('.')
+    name_start = path.rfind('/') + 1
+    # Same rule as os.path.splitext: the dot must follow at least one non-dot character of the file name
+    if dot > name_start and path[name_start:dot].strip('.'):
+        img_ext = path[dot:]
+        if len(img_ext) <= 5:
+            return img_ext
+    return '.png'
+
+
+def collect_image_info(elem, inline_objects, img_counter, image_prefix=None, use_relative_path=False):
     """
     Collect image info without downloading
     (Original logic copied)
@@ -120,15 +210,13 @@ def collect_image_info(elem, inline_objects, img_count_ref, image_prefix=None, u
         img_url = embedded_obj['imageProperties']['sourceUri']
 
     if img_url:
-        img_ext = os.path.splitext(img_url.split('?')[0])[1]
-        if not img_ext or len(img_ext) > 5:
-            img_ext = '.png'
+        img_ext = get_image_extension(img_url)
 
+        img_number = next(img_counter)
         if image_prefix:
-            img_filename = f'{image_prefix}_image_{img_count_ref[0]}{img_ext}'
+            img_filename = f'{image_prefix}_image_{img_number}{img_ext}'
         else:
-            img_filename = f'image_{img_count_ref[0]}{img_ext}'
-        img_count_ref[0] += 1
+            img_filename = f'image_{img_number}{img_ext}'
 
         images_path = "../images/" if use_relative_path else "./images/"
         img_tag = f'<img src="{images_path}{img_filename}" />'
@@ -137,11 +225,11 @@ def collect_image_info(elem, inline_objects, img_count_ref, image_prefix=None, u
     return None, None, None
 
 
-def process_inline_image_sync(elem, inline_objects, images_dir, img_count_ref, config: Config, image_prefix=None):
+def process_inline_image_sync(elem, inline_objects, images_dir, img_counter, config: Config, image_prefix=None):
     """
     Synchronously process an image (for simple cases, e.g., in tables)
     """
-    img_url, img_filename, img_tag = collect_image_info(elem, inline_objects, img_count_ref, image_prefix)
+    img_url, img_filename, img_tag = collect_image_info(elem, inline_objects, img_counter, image_prefix)
     if img_url and img_filename:
         if download_image(img_url, images_dir, img_filename, config):  # Pass config
             return img_tag
@@ -159,11 +247,18 @@ async def collect_all_images_from_document(doc, image_prefix=None):
     paragraph_image_map = {}
     table_image_map = {}
     url_to_filename = {}
-    img_count = [1]  # Use list to pass by reference
+    # (filename, use_relative_path) -> <img> tag for images seen again, e.g. a logo in every table row
+    repeated_img_tags = {}
+    img_counter = count(1)
+
+    # Without inline objects no element can be an image, so the body isn't walked at all
+    if not inline_objects:
+        logger.info("Collected 0 unique images for download")
+        return download_tasks, paragraph_image_map, table_image_map
 
     def process_inline_object_element(elem, use_relative_path=False):
         object_id = elem['inlineObjectElement']['inlineObjectId']
-        img_url, img_filename, img_tag = collect_image_info(elem, inline_objects, img_count, image_prefix,
+        img_url, img_filename, img_tag = collect_image_info(elem, inline_objects, img_counter, image_prefix,
                                                             use_relative_path)
         if img_url and img_filename:
             if img_url not in url_to_filename:
@@ -171,9 +266,12 @@ async def collect_all_images_from_document(doc, image_prefix=None):
                 download_tasks.append((img_url, None, img_filename))
             else:
                 existing_filename = url_to_filename[img_url]
-                images_path = "../images/" if use_relative_path else "./images/"
-                # Create alt="Image" for validity
-                img_tag = f'<img src="{images_path}{existing_filename}" alt="Image" />'
+                tag_key = (existing_filename, use_relative_path)
+                img_tag = repeated_img_tags.get(tag_key)
+                if img_tag is None:
+                    images_path = "../images/" if use_relative_path else "./images/"
+                    # Create alt="Image" for validity
+                    img_tag = repeated_img_tags[tag_key] = f'<img src="{images_path}{existing_filename}" alt="Image" />'
                 img_filename = existing_filename
             return object_id, img_filename, img_tag
         return None, None, None
@@ -4,12 +4,19 @@ from .text import process_text_run_enhanced, process_line_breaks_in_text
 
 logger = logging.getLogger(__name__)
 
+_BULLET_SYMBOLS = frozenset('●○■▪▫◦‣⁃-*+•')
+_ORDERED_GLYPH_TYPES = frozenset({'DECIMAL', 'ALPHA', 'UPPER_ALPHA', 'ROMAN', 'UPPER_ROMAN'})
+
+# HTML list indentation per nesting depth, extended by _html_indents when a list nests deeper
+_HTML_INDENTS = ['  ' * depth for depth in range(16)]
+
 def process_list_content_with_line_breaks(elements, inline_objects, paragraph_image_map, image_download_map, bookmarks, headers, config: Config):
     """
     NEW FUNCTION: Process list item content
     (Original logic copied, with config passing)
     """
-    content = ""
+    parts = []
+    last_char = ""  # Last character written to parts, stands in for content[-1]
     previous_endswith_alnum = False
     code_fonts = config.code_fonts # Use config
 
@@ -19,15 +26,16 @@ def process_list_content_with_line_breaks(elements, inline_objects, paragraph_im
             if object_id in paragraph_image_map:
                 img_filename, img_tag = paragraph_image_map[object_id]
                 if image_download_map.get(img_filename, False):
-                    if content and content[-1].isalnum():
-                        content += " "
-                    content += f"![Image](./images/{img_filename})"
+                    if last_char.isalnum():
+                        parts.append(" ")
+                    parts.append(f"![Image](./images/{img_filename})")
+                    last_char = ")"
         elif 'textRun' in elem:
             run_text = elem['textRun'].get('content', '')
             text_style = elem['textRun'].get('textStyle', {})
-            font_family = text_style.get('fontFamily', '')
+            font_family = text_style.get('fontFamily', '').lower()
 
-            is_inline_code_fallback = any(font_name in font_family.lower() for font_name in code_fonts) and not font_family.lower() == 'consolas'
+            is_inline_code_fallback = any(font_name in font_family for font_name in code_fonts) and not font_family == 'consolas'
 
             if is_inline_code_fallback:
                 processed_text = process_line_breaks_in_text(run_text)
@@ -35,48 +43,17 @@ def process_list_content_with_line_breaks(elements, inline_objects, paragraph_im
             else:
                 processed = process_text_run_enhanced(elem['textRun'], bookmarks, headers, config) # Pass config
 
-            if content and previous_endswith_alnum and processed and processed[0].isalnum():
-                content += ' '
-            content += processed
+            if last_char and previous_endswith_alnum and processed and processed[0].isalnum():
+                parts.append(' ')
+            if processed:
+                parts.append(processed)
+                last_char = processed[-1]
             previous_endswith_alnum = processed[-1].isalnum() if processed else False
-    return content.strip()
+    return ''.join(parts).strip()
 
 
-def process_list_content_with_line_breaks_for_chunks(elements, inline_objects, paragraph_image_map, image_download_map, bookmarks, headers, config: Config):
-    """
-    Process list item content for chunks
-    (Original logic copied, with config passing)
-    """
-    content = ""
-    previous_endswith_alnum = False
-    code_fonts = config.code_fonts # Use config
-
-    for elem in elements:
-        if 'inlineObjectElement' in elem:
-            object_id = elem['inlineObjectElement']['inlineObjectId']
-            if object_id in paragraph_image_map:
-                img_filename, img_tag = paragraph_image_map[object_id]
-                if image_download_map.get(img_filename, False):
-                    if content and content[-1].isalnum():
-                        content += " "
-                    content += f"![Image](./images/{img_filename})"
-        elif 'textRun' in elem:
-            run_text = elem['textRun'].get('content', '')
-            text_style = elem['textRun'].get('textStyle', {})
-            font_family = text_style.get('fontFamily', '')
-            is_inline_code_fallback = any(font_name in font_family.lower() for font_name in code_fonts) and not font_family.lower() == 'consolas'
-
-            if is_inline_code_fallback:
-                processed_text = process_line_breaks_in_text(run_text)
-                processed = f"`{processed_text.strip()}`"
-            else:
-                processed = process_text_run_enhanced(elem['textRun'], bookmarks, headers, config) # Pass config
-
-            if content and previous_endswith_alnum and processed and processed[0].isalnum():
-                content += ' '
-            content += processed
-            previous_endswith_alnum = processed[-1].isalnum() if processed else False
-    return content.strip()
+# Chunked processing uses exactly the same logic, kept as an alias for existing callers
+process_list_content_with_line_breaks_for_chunks = process_list_content_with_line_breaks
 
 
 def get_list_marker(list_props, nesting_level, list_counters, list_id):
@@ -121,13 +98,11 @@ def is_ordered_list(list_props, nesting_level):
     glyph_type = nesting_info.get('glyphType', '')
     glyph_symbol = nesting_info.get('glyphSymbol', '')
 
-    bullet_symbols = ['●', '○', '■', '▪', '▫', '◦', '‣', '⁃', '-', '*', '+', '•']
-    if glyph_symbol and glyph_symbol in bullet_symbols:
+    if glyph_symbol and glyph_symbol in _BULLET_SYMBOLS:
         return False
 
     has_number_format = glyph_format and '%' in glyph_format
-    ordered_glyph_types = ['DECIMAL', 'ALPHA', 'UPPER_ALPHA', 'ROMAN', 'UPPER_ROMAN']
-    has_ordered_type = glyph_type in ordered_glyph_types
+    has_ordered_type = glyph_type in _ORDERED_GLYPH_TYPES
     return has_number_format and has_ordered_type
 
 
@@ -169,6 +144,13 @@ def process_list_item_in_paragraph(para, lists, list_counters):
     return indent + '- ', 'unordered'
 
 
+def _html_indents(max_depth):
+    """Return the shared indentation table, covering every depth up to max_depth"""
+    while max_depth >= len(_HTML_INDENTS):
+        _HTML_INDENTS.append('  ' * len(_HTML_INDENTS))
+    return _HTML_INDENTS
+
+
 def build_list_html_fixed(list_type, items):
     """
     FIXED function to build list HTML
@@ -179,6 +161,8 @@ def build_list_html_fixed(list_type, items):
     html_lines = []
     current_level = 0
     open_lists = []
+    # Lists are never open deeper than the deepest item level
+    indents = _html_indents(max(item['level'] for item in items))
 
     for item in items:
         level = item['level']
@@ -187,24 +171,24 @@ def build_list_html_fixed(list_type, items):
         html_tag = 'ol' if item_type == 'ordered' else 'ul'
 
         while current_level < level:
-            html_lines.append('  ' * len(open_lists) + f'<{html_tag}>')
+            html_lines.append(indents[len(open_lists)] + f'<{html_tag}>')
             open_lists.append(html_tag)
             current_level += 1
         while current_level > level:
             if open_lists:
                 closed_type = open_lists.pop()
-                html_lines.append('  ' * len(open_lists) + f'</{closed_type}>')
+                html_lines.append(indents[len(open_lists)] + f'</{closed_type}>')
             current_level -= 1
         if open_lists and open_lists[-1] != html_tag:
             closed_type = open_lists.pop()
-            html_lines.append('  ' * len(open_lists) + f'</{closed_type}>')
-            html_lines.append('  ' * len(open_lists) + f'<{html_tag}>')
+            html_lines.append(indents[len(open_lists)] + f'</{closed_type}>')
+            html_lines.append(indents[len(open_lists)] + f'<{html_tag}>')
             open_lists.append(html_tag)
 
-        indent = '  ' * len(open_lists)
+        indent = indents[len(open_lists)]
         html_lines.append(f'{indent}<li>{text}</li>')
 
     while open_lists:
         closed_type = open_lists.pop()
-        html_lines.append('  ' * len(open_lists) + f'</{closed_type}>')
+        html_lines.append(indents[len(open_lists)] + f'</{closed_type}>')
     return '\n'.join(html_lines)
\ No newline at end of file
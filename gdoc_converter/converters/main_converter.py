@@ -2,8 +2,10 @@ import os
 import logging
 import asyncio
 import time
-from googleapiclient.discovery import build
+from itertools import chain, count
 from ..config import Config
+from ..google_services import build_docs_service
+from ..utils import slugify
 from ..exceptions import DocumentSizeError
 from .images import ImageDownloadManager, collect_all_images_from_document
 from .text import process_text_run_enhanced
@@ -17,6 +19,12 @@ from .post_processor import post_process_markdown_code_blocks, join_markdown_lin
 
 logger = logging.getLogger(__name__)
 
+# Concurrent image downloads used for documents processed in chunks
+CHUNKED_MAX_CONCURRENT_DOWNLOADS = 2
+
+# Markdown prefix for each Google Docs heading style (HEADING_1 -> "# ")
+_HEADING_PREFIX = {f"HEADING_{i}": "#" * i + " " for i in range(1, 7)}
+
 
 # --- Size Check and Chunking ---
 
@@ -26,34 +34,22 @@ def check_document_size(doc, config: Config):
     """
     try:
         body = doc.get('body', {}).get('content', [])
+        max_size = config.max_doc_size
         estimated_size = 0
         element_count = 0
 
         for element in body:
             element_count += 1
-            # (Original size estimation code)
-            if 'paragraph' in element:
-                para = element['paragraph']
-                for elem in para.get('elements', []):
-                    if 'textRun' in elem:
-                        estimated_size += len(elem['textRun'].get('content', ''))
-            elif 'table' in element:
-                table = element['table']
-                for row in table.get('tableRows', []):
-                    for cell in row.get('tableCells', []):
-                        for cell_content in cell.get('content', []):
-                            if 'paragraph' in cell_content:
-                                para = cell_content['paragraph']
-                                for elem in para.get('elements', []):
-                                    if 'textRun' in elem:
-                                        estimated_size += len(elem['textRun'].get('content', ''))
+            estimated_size += estimate_element_size(element)
+            # Stop as soon as the limit is crossed, the rest of the document doesn't change the answer
+            if estimated_size > max_size:
+                raise DocumentSizeError(
+                    f"Document too large: at least {estimated_size} characters in the first {element_count} "
+                    f"of {len(body)} elements (max: {max_size})"
+                )
 
         logger.info(f"Document size estimate: {estimated_size} characters, {element_count} elements")
 
-        max_size = config.max_doc_size
-        if estimated_size > max_size:
-            raise DocumentSizeError(f"Document too large: {estimated_size} characters (max: {max_size})")
-
         if element_count > 10000:
             logger.warning(f"Document has many elements: {element_count}. Processing may be slow.")
 
@@ -64,6 +60,13 @@ def check_document_size(doc, config: Config):
         raise
 
 
+def fetch_document(creds, document_id: str):
+    """
+    Fetch a document with the calling thread's Docs API client
+    """
+    return get_document_with_retry(build_docs_service(creds), document_id)
+
+
 def get_document_with_retry(docs_service, document_id: str, max_retries=3):
     """
     Get document with retries on failure
@@ -103,22 +106,14 @@ def process_document_in_chunks(doc, config: Config):
     for element in body:
         element_size = estimate_element_size(element)
 
-        if 'table' in element:
-            if current_size + element_size > chunk_size and current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = [element]
-                current_size = element_size
-            else:
-                current_chunk.append(element)
-                current_size += element_size
+        # Tables are never split, so every element is kept whole in one chunk
+        if current_size + element_size > chunk_size and current_chunk:
+            chunks.append(current_chunk)
+            current_chunk = [element]
+            current_size = element_size
         else:
-            if current_size + element_size > chunk_size and current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = [element]
-                current_size = element_size
-            else:
-                current_chunk.append(element)
-                current_size += element_size
+            current_chunk.append(element)
+            current_size += element_size
 
     if current_chunk:
         chunks.append(current_chunk)
@@ -132,39 +127,47 @@ def estimate_element_size(element):
     Roughly estimate the size of a document element
     (Original logic copied)
     """
+    para = element.get('paragraph')
+    if para is not None:
+        return _paragraph_text_size(para)
+
     size = 0
-    if 'paragraph' in element:
-        para = element['paragraph']
-        for elem in para.get('elements', []):
-            if 'textRun' in elem:
-                size += len(elem['textRun'].get('content', ''))
-    elif 'table' in element:
-        table = element['table']
+    table = element.get('table')
+    if table is not None:
         for row in table.get('tableRows', []):
             for cell in row.get('tableCells', []):
                 for cell_content in cell.get('content', []):
-                    if 'paragraph' in cell_content:
-                        para = cell_content['paragraph']
-                        for elem in para.get('elements', []):
-                            if 'textRun' in elem:
-                                size += len(elem['textRun'].get('content', ''))
+                    cell_para = cell_content.get('paragraph')
+                    if cell_para is not None:
+                        size += _paragraph_text_size(cell_para)
+    return size
+
+
+def _paragraph_text_size(para):
+    """Count the characters in a paragraph's text runs"""
+    size = 0
+    for elem in para.get('elements', []):
+        text_run = elem.get('textRun')
+        if text_run is not None:
+            size += len(text_run.get('content', ''))
     return size
 
 
 # --- Bookmarks and Headers ---
 
 def extract_bookmarks_and_headers(doc):
-    """Extract bookmarks and headers from document for link processing"""
-    # (Original logic copied)
+    """
+    Extract bookmarks and headers from document for link processing.
+    bookmarks maps bookmark IDs, and the headingId of every heading, to their anchor slug,
+    so links to either kind of target are resolved with a single dict lookup.
+    """
     bookmarks = {}
     headers = {}
     doc_bookmarks = doc.get('bookmarks', {})
     for bookmark_id, bookmark_data in doc_bookmarks.items():
         text_content = bookmark_data.get('textContent', '')
         if text_content:
-            slug = text_content.strip().lower().replace(' ', '-').replace('_', '-')
-            slug = ''.join(c for c in slug if c.isalnum() or c == '-')
-            bookmarks[bookmark_id] = slug
+            bookmarks[bookmark_id] = slugify(text_content.strip())
 
     body = doc.get('body', {}).get('content', [])
     for element in body:
@@ -172,15 +175,15 @@ def extract_bookmarks_and_headers(doc):
             para = element['paragraph']
             paragraph_style = para.get('paragraphStyle', {})
             named_style = paragraph_style.get('namedStyleType', '')
-            if named_style.startswith("HEADING_"):
-                header_text = ""
-                for elem in para.get('elements', []):
-                    if 'textRun' in elem:
-                        header_text += elem['textRun'].get('content', '')
-                if header_text.strip():
-                    slug = header_text.strip().lower().replace(' ', '-').replace('_', '-')
-                    slug = ''.join(c for c in slug if c.isalnum() or c == '-')
-                    headers[header_text.strip()] = slug
+            if named_style in _HEADING_PREFIX:
+                header_text = ''.join(elem['textRun'].get('content', '')
+                                      for elem in para.get('elements', []) if 'textRun' in elem).strip()
+                if header_text:
+                    slug = slugify(header_text)
+                    headers[header_text] = slug
+                    heading_id = paragraph_style.get('headingId')
+                    if heading_id:
+                        bookmarks[heading_id] = slug
     return bookmarks, headers
 
 
@@ -196,9 +199,8 @@ def detect_code_block(paragraph, config: Config):
     code_fonts = config.code_fonts  # Use config
     for elem in elements:
         if 'textRun' in elem:
-            text_style = elem['textRun'].get('textStyle', {})
-            font_family = elem['textRun'].get('textStyle', {}).get('fontFamily', '')
-            if any(font_name in font_family.lower() for font_name in code_fonts):
+            font_family = elem['textRun'].get('textStyle', {}).get('fontFamily', '').lower()
+            if any(font_name in font_family for font_name in code_fonts):
                 return True
     return False
 
@@ -208,16 +210,17 @@ def add_header_anchors(line, named_style):
     FIXED: Add anchor tags to headers without adding extra <br/> tags
     (Original logic copied)
     """
-    if named_style.startswith("HEADING_"):
-        header_text = line.lstrip('#').strip()
-        if header_text:
-            header_text = header_text.replace('<br />', ' ').strip()
-            slug = header_text.lower().replace(' ', '-').replace('_', '-')
-            slug = ''.join(c for c in slug if c.isalnum() or c == '-')
-            level = named_style.replace("HEADING_", "")
-            clean_header = "#" * int(level) + " " + header_text
-            return f"{clean_header} {{#{slug}}}"
-    return line
+    heading_marker = _HEADING_PREFIX.get(named_style)
+    if heading_marker is None:
+        return line
+
+    header_text = line.lstrip('#').strip()
+    if not header_text:
+        return line
+    header_text = header_text.replace('<br />', ' ').strip()
+    slug = slugify(header_text)
+    clean_header = heading_marker + header_text
+    return f"{clean_header} {{#{slug}}}"
 
 
 # --- Main Conversion Functions ---
@@ -228,8 +231,8 @@ async def convert_gdoc_to_markdown_large(document_id, output_md_path, images_dir
     IMPROVED conversion function for large documents
     """
     try:
-        docs_service = build('docs', 'v1', credentials=creds)
-        doc = get_document_with_retry(docs_service, document_id)
+        # The API client is blocking; fetching in a thread keeps other documents on the loop moving
+        doc = await asyncio.to_thread(fetch_document, creds, document_id)
         estimated_size, element_count = check_document_size(doc, config)  # Pass config
         os.makedirs(images_dir, exist_ok=True)
         bookmarks, headers = extract_bookmarks_and_headers(doc)
@@ -283,6 +286,7 @@ async def convert_gdoc_to_markdown_standard(doc, output_md_path, images_dir, cre
             paragraph_style = para.get('paragraphStyle', {})
             named_style = paragraph_style.get('namedStyleType', '')
             bullet = para.get('bullet')
+            heading_marker = _HEADING_PREFIX.get(named_style)
             line = ""
             previous_endswith_alnum = False
 
@@ -308,9 +312,8 @@ async def convert_gdoc_to_markdown_standard(doc, output_md_path, images_dir, cre
                         # Pass config
                     )
                     line += list_content
-            elif named_style.startswith("HEADING_"):
-                level = int(named_style.replace("HEADING_", ""))
-                line += "#" * level + " "
+            elif heading_marker is not None:
+                line += heading_marker
                 # (Header element processing...)
                 for elem in elements:
                     if 'inlineObjectElement' in elem:
@@ -322,16 +325,17 @@ async def convert_gdoc_to_markdown_standard(doc, output_md_path, images_dir, cre
                                     line += " "
                                 line += f"![Image](./images/{img_filename})"
                     elif 'textRun' in elem:
-                        run_text = elem['textRun'].get('content', '')
-                        text_style = elem['textRun'].get('textStyle', {})
-                        font_family = text_style.get('fontFamily', '')
-                        is_inline_code_fallback = any(font_name in font_family.lower() for font_name in
-                                                      code_fonts) and not font_family.lower() == 'consolas'
+                        text_run = elem['textRun']
+                        run_text = text_run.get('content', '')
+                        text_style = text_run.get('textStyle', {})
+                        # Lowercased once; runs without their own font (the usual case) can't be code
+                        font_family = text_style.get('fontFamily', '').lower()
+                        is_inline_code_fallback = bool(font_family) and font_family != 'consolas' and any(
+                            font_name in font_family for font_name in code_fonts)
                         if is_inline_code_fallback and not in_code_block:
                             processed = f"`{run_text.strip()}`"
                         else:
-                            processed = process_text_run_enhanced(elem['textRun'], bookmarks, headers,
-                                                                  config)  # Pass config
+                            processed = process_text_run_enhanced(text_run, bookmarks, headers, config)  # Pass config
                         if line and previous_endswith_alnum and processed and processed[0].isalnum():
                             line += ' '
                         line += processed
@@ -348,31 +352,30 @@ async def convert_gdoc_to_markdown_standard(doc, output_md_path, images_dir, cre
                                     line += " "
                                 line += f"![Image](./images/{img_filename})"
                     elif 'textRun' in elem:
-                        run_text = elem['textRun'].get('content', '')
-                        text_style = elem['textRun'].get('textStyle', {})
-                        font_family = text_style.get('fontFamily', '')
-                        is_inline_code_fallback = any(font_name in font_family.lower() for font_name in
-                                                      code_fonts) and not font_family.lower() == 'consolas'
+                        text_run = elem['textRun']
+                        run_text = text_run.get('content', '')
+                        text_style = text_run.get('textStyle', {})
+                        # Lowercased once; runs without their own font (the usual case) can't be code
+                        font_family = text_style.get('fontFamily', '').lower()
+                        is_inline_code_fallback = bool(font_family) and font_family != 'consolas' and any(
+                            font_name in font_family for font_name in code_fonts)
                         if is_inline_code_fallback and not in_code_block:
                             processed = f"`{run_text.strip()}`"
                         else:
-                            processed = process_text_run_enhanced(elem['textRun'], bookmarks, headers,
-                                                                  config)  # Pass config
+                            processed = process_text_run_enhanced(text_run, bookmarks, headers, config)  # Pass config
                         if line and previous_endswith_alnum and processed and processed[0].isalnum():
                             line += ' '
                         line += processed
                         previous_endswith_alnum = processed[-1].isalnum() if processed else False
 
             if in_code_block and is_code_block:
-                code_text = ""
-                for elem in elements:
-                    if 'textRun' in elem:
-                        code_text += elem['textRun'].get('content', '')
+                code_text = ''.join(elem['textRun'].get('content', '') for elem in elements if 'textRun' in elem)
                 code_block_lines.append(code_text.rstrip())
             else:
                 if line.strip():
-                    line_with_anchor = add_header_anchors(line, named_style)
-                    md_lines.append(line_with_anchor.rstrip())
+                    if heading_marker is not None:
+                        line = add_header_anchors(line, named_style)
+                    md_lines.append(line.rstrip())
 
         elif 'table' in element:
             if in_code_block and code_block_lines:
@@ -382,8 +385,8 @@ async def convert_gdoc_to_markdown_standard(doc, output_md_path, images_dir, cre
                 code_block_lines = []
                 in_code_block = False
 
-            img_count_ref = [1]  # Local counter for this table
-            md_table = table_to_markdown(element['table'], inline_objects, images_dir, img_count_ref,
+            img_counter = count(1)  # Local counter for this table
+            md_table = table_to_markdown(element['table'], inline_objects, images_dir, img_counter,
                                          bookmarks, headers, lists, config, image_prefix, table_image_map,
                                          image_download_map)  # Pass config
             if md_table.strip():
@@ -395,13 +398,7 @@ async def convert_gdoc_to_markdown_standard(doc, output_md_path, images_dir, cre
         md_lines.append('```')
 
     content = join_markdown_lines_smart(md_lines)
-
-    with open(output_md_path, 'w', encoding='utf-8') as f:
-        f.write(content)
-
-    with open(output_md_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
+    # Post-processing splits on every line boundary itself, so the content never needs a trip through the file
     processed_content = post_process_markdown_code_blocks(content, config)  # Pass config
 
     with open(output_md_path, 'w', encoding='utf-8') as f:
@@ -419,51 +416,31 @@ async def convert_large_document_chunked(doc, output_md_path, images_dir, creds,
 
     image_download_map = {}
     if download_tasks:
-        batch_size = 10
         updated_tasks = [(url, images_dir, filename) for url, _, filename in download_tasks]
 
-        for i in range(0, len(updated_tasks), batch_size):
-            batch = updated_tasks[i:i + batch_size]
-            logger.info(f"Processing image batch {i // batch_size + 1}")
-
-            # Create a new manager with fewer concurrent downloads for chunks
-            chunk_config_data = config.data.copy()
-            chunk_config_data['network']['max_concurrent_image_downloads'] = 2
-            chunk_config = Config(config_path="")  # Dummy path
-            chunk_config.data = chunk_config_data
-
-            async with ImageDownloadManager(chunk_config) as download_manager:  # Pass modified config
-                batch_results = await download_manager.download_images_batch(batch)
-                image_download_map.update(batch_results)
-            await asyncio.sleep(1)
+        # One manager (and one connection pool) for all images; its TCPConnector pool and the worker
+        # pool of download_images_batch are both sized by max_concurrent, keeping large documents
+        # to fewer concurrent downloads
+        async with ImageDownloadManager(config, max_concurrent=CHUNKED_MAX_CONCURRENT_DOWNLOADS) as download_manager:
+            image_download_map = await download_manager.download_images_batch(updated_tasks)
 
     chunks = process_document_in_chunks(doc, config)  # Pass config
-    all_md_lines = []
+    inline_objects = doc.get('inlineObjects', {})
+    lists = doc.get('lists', {})
+    chunk_results = []
 
     for i, chunk in enumerate(chunks):
         logger.info(f"Processing chunk {i + 1}/{len(chunks)}")
-        temp_doc = {
-            'body': {'content': chunk},
-            'inlineObjects': doc.get('inlineObjects', {}),
-            'lists': doc.get('lists', {}),
-            'bookmarks': doc.get('bookmarks', {})
-        }
-
         chunk_md_lines = await process_document_chunk(
-            temp_doc, images_dir, bookmarks, headers,
+            chunk, inline_objects, lists, images_dir, bookmarks, headers,
             paragraph_image_map, table_image_map, image_download_map, config, image_prefix  # Pass config
         )
-        all_md_lines.extend(chunk_md_lines)
+        chunk_results.append(chunk_md_lines)
         await asyncio.sleep(0.5)
 
+    all_md_lines = list(chain.from_iterable(chunk_results))
     content = join_markdown_lines_smart(all_md_lines)
-
-    with open(output_md_path, 'w', encoding='utf-8') as f:
-        f.write(content)
-
-    with open(output_md_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
+    # Post-processing splits on every line boundary itself, so the content never needs a trip through the file
     processed_content = post_process_markdown_code_blocks(content, config)  # Pass config
 
     with open(output_md_path, 'w', encoding='utf-8') as f:
@@ -472,17 +449,16 @@ async def convert_large_document_chunked(doc, output_md_path, images_dir, creds,
     logger.info(f"Large document converted successfully to {output_md_path}")
 
 
-async def process_document_chunk(doc, images_dir, bookmarks, headers, paragraph_image_map, table_image_map,
-                                 image_download_map, config: Config, image_prefix):
+async def process_document_chunk(body, inline_objects, lists, images_dir, bookmarks, headers, paragraph_image_map,
+                                 table_image_map, image_download_map, config: Config, image_prefix):
     """
     FIXED: Process a document chunk
+    (body is the chunk's slice of the document content; inline_objects and
+    lists are shared with the whole document)
     """
     # (Logic is almost identical to convert_gdoc_to_markdown_standard, but without image downloading)
     # (Original logic copied, with config passing added)
 
-    body = doc.get('body', {}).get('content', [])
-    inline_objects = doc.get('inlineObjects', {})
-    lists = doc.get('lists', {})
     md_lines = []
     list_counters = {}
     in_code_block = False
@@ -497,6 +473,7 @@ async def process_document_chunk(doc, images_dir, bookmarks, headers, paragraph_
                 paragraph_style = para.get('paragraphStyle', {})
                 named_style = paragraph_style.get('namedStyleType', '')
                 bullet = para.get('bullet')
+                heading_marker = _HEADING_PREFIX.get(named_style)
                 line = ""
                 previous_endswith_alnum = False
 
@@ -522,9 +499,8 @@ async def process_document_chunk(doc, images_dir, bookmarks, headers, paragraph_
                             config  # Pass config
                         )
                         line += list_content
-                elif named_style.startswith("HEADING_"):
-                    level = int(named_style.replace("HEADING_", ""))
-                    line += "#" * level + " "
+                elif heading_marker is not None:
+                    line += heading_marker
                     # (Header element processing...)
                     for elem in elements:
                         if 'inlineObjectElement' in elem:
@@ -536,15 +512,17 @@ async def process_document_chunk(doc, images_dir, bookmarks, headers, paragraph_
                                         line += " "
                                     line += f"![Image](./images/{img_filename})"
                         elif 'textRun' in elem:
-                            run_text = elem['textRun'].get('content', '')
-                            text_style = elem['textRun'].get('textStyle', {})
-                            font_family = text_style.get('fontFamily', '')
-                            is_inline_code_fallback = any(font_name in font_family.lower() for font_name in
-                                                          code_fonts) and not font_family.lower() == 'consolas'
+                            text_run = elem['textRun']
+                            run_text = text_run.get('content', '')
+                            text_style = text_run.get('textStyle', {})
+                            # Lowercased once; runs without their own font (the usual case) can't be code
+                            font_family = text_style.get('fontFamily', '').lower()
+                            is_inline_code_fallback = bool(font_family) and font_family != 'consolas' and any(
+                                font_name in font_family for font_name in code_fonts)
                             if is_inline_code_fallback and not in_code_block:
                                 processed = f"`{run_text.strip()}`"
                             else:
-                                processed = process_text_run_enhanced(elem['textRun'], bookmarks, headers,
+                                processed = process_text_run_enhanced(text_run, bookmarks, headers,
                                                                       config)  # Pass config
                             if line and previous_endswith_alnum and processed and processed[0].isalnum():
                                 line += ' '
@@ -562,15 +540,17 @@ async def process_document_chunk(doc, images_dir, bookmarks, headers, paragraph_
                                         line += " "
                                     line += f"![Image](./images/{img_filename})"
                         elif 'textRun' in elem:
-                            run_text = elem['textRun'].get('content', '')
-                            text_style = elem['textRun'].get('textStyle', {})
-                            font_family = text_style.get('fontFamily', '')
-                            is_inline_code_fallback = any(font_name in font_family.lower() for font_name in
-                                                          code_fonts) and not font_family.lower() == 'consolas'
+                            text_run = elem['textRun']
+                            run_text = text_run.get('content', '')
+                            text_style = text_run.get('textStyle', {})
+                            # Lowercased once; runs without their own font (the usual case) can't be code
+                            font_family = text_style.get('fontFamily', '').lower()
+                            is_inline_code_fallback = bool(font_family) and font_family != 'consolas' and any(
+                                font_name in font_family for font_name in code_fonts)
                             if is_inline_code_fallback and not in_code_block:
                                 processed = f"`{run_text.strip()}`"
                             else:
-                                processed = process_text_run_enhanced(elem['textRun'], bookmarks, headers,
+                                processed = process_text_run_enhanced(text_run, bookmarks, headers,
                                                                       config)  # Pass config
                             if line and previous_endswith_alnum and processed and processed[0].isalnum():
                                 line += ' '
@@ -578,15 +558,13 @@ async def process_document_chunk(doc, images_dir, bookmarks, headers, paragraph_
                             previous_endswith_alnum = processed[-1].isalnum() if processed else False
 
                 if in_code_block and is_code_block:
-                    code_text = ""
-                    for elem in elements:
-                        if 'textRun' in elem:
-                            code_text += elem['textRun'].get('content', '')
+                    code_text = ''.join(elem['textRun'].get('content', '') for elem in elements if 'textRun' in elem)
                     code_block_lines.append(code_text.rstrip())
                 else:
                     if line.strip():
-                        line_with_anchor = add_header_anchors(line, named_style)
-                        md_lines.append(line_with_anchor.rstrip())
+                        if heading_marker is not None:
+                            line = add_header_anchors(line, named_style)
+                        md_lines.append(line.rstrip())
 
             elif 'table' in element:
                 if in_code_block and code_block_lines:
@@ -598,8 +576,8 @@ async def process_document_chunk(doc, images_dir, bookmarks, headers, paragraph_
 
                 table_data = element['table']
                 if 'tableRows' in table_data:
-                    img_count_ref = [1]
-                    md_table = table_to_markdown(table_data, inline_objects, images_dir, img_count_ref,
+                    img_counter = count(1)
+                    md_table = table_to_markdown(table_data, inline_objects, images_dir, img_counter,
                                                  bookmarks, headers, lists, config, image_prefix, table_image_map,
                                                  # Pass config
                                                  image_download_map)
@@ -4,6 +4,23 @@ from ..config import Config
 
 logger = logging.getLogger(__name__)
 
+# <br /> at the very end of a line
+_TRAILING_BR_RE = re.compile(r'<br\s*/>\s*$')
+
+# Whole-document patterns for clean_excessive_line_breaks. [^\S\n] is whitespace that stays on the same line.
+# Header with a <br /> right before its {#anchor}
+_HEADER_BR_RE = re.compile(r'^(#+[^\S\n].*?)<br[^\S\n]*/>[^\S\n]*(\{#.*)$', re.MULTILINE)
+# Bulleted / numbered list item ending in <br />
+_LIST_ITEM_BR_RE = re.compile(r'^([^\S\n]*(?:[-*+]|\d+\.)[^\S\n].*)<br[^\S\n]*/>[^\S\n]*$', re.MULTILINE)
+# Line ending in <br /> that is followed by a blank line or the end of the document
+_BR_BEFORE_BLANK_RE = re.compile(r'<br ?/>$(?=\n[^\S\n]*$|\Z)', re.MULTILINE)
+# Starts of the lines _HEADER_BR_RE / _LIST_ITEM_BR_RE take care of instead
+_HEADER_BR_LINE_START_RE = re.compile(r'#+[^\S\n].*<br[^\S\n]*/>[^\S\n]*\{#')
+_LIST_ITEM_LINE_START_RE = re.compile(r'[^\S\n]*(?:[-*+]|\d+\.)[^\S\n]')
+
+# Numbered list marker, for the lines is_list_item can't settle from the first character
+_NUMBERED_MARKER_RE = re.compile(r'\d+\.\s')
+
 
 def post_process_markdown_code_blocks(content: str, config: Config) -> str:
     """
@@ -11,7 +28,8 @@ def post_process_markdown_code_blocks(content: str, config: Config) -> str:
     (Original logic copied, with config passing)
     """
     marker = config.code_block_marker  # Use config
-    if marker not in content:
+    # An empty marker is "in" every line and would never be consumed by the loop below
+    if not marker or marker not in content:
         return clean_excessive_line_breaks(content)
 
     lines = content.splitlines()
@@ -38,35 +56,56 @@ def post_process_markdown_code_blocks(content: str, config: Config) -> str:
         processed_lines.append("```")
         logger.warning("Auto-closed unclosed code block at end of document")
 
-    processed_content = '\n'.join(processed_lines)
-    processed_content = re.sub(r'```\n\n```', '```\n```', processed_content)
-    processed_content = ensure_proper_code_block_spacing(processed_content)
+    processed_content = finalize_markdown(processed_lines)
     processed_content = clean_excessive_line_breaks(processed_content)
     return processed_content
 
 
+def finalize_markdown(lines: list) -> str:
+    """
+    Drop blank lines between adjacent fences and fix code block spacing without joining and re-splitting
+    (Original logic of the '```\n\n```' replace and ensure_proper_code_block_spacing)
+    """
+    # Blank lines the replace would remove. Its matches never overlap, so a fence line
+    # closing one removed gap can open the next one only if it holds two fences' worth of backticks
+    dropped = [False] * len(lines)
+    for i in range(1, len(lines) - 1):
+        if (not lines[i] and lines[i - 1].endswith('```') and lines[i + 1].startswith('```')
+                and not (i >= 2 and dropped[i - 2] and len(lines[i - 1]) < 6)):
+            dropped[i] = True
+    kept = [line for line, drop in zip(lines, dropped) if not drop]
+    # splitlines() never returned a trailing blank line, so neither does this
+    if kept and not kept[-1]:
+        kept.pop()
+    return '\n'.join(_space_code_blocks(kept))
+
+
 def clean_excessive_line_breaks(content: str) -> str:
     """
     NEW FUNCTION: Clean up excessive <br /> tags
     (Original logic copied)
     """
-    lines = content.splitlines()
-    cleaned_lines = []
-    for i, line in enumerate(lines):
-        cleaned_line = line
-        # Remove <br /> after headers
-        if re.match(r'^#+\s.*<br\s*/>\s*{#.*}?\s*$', line):
-            cleaned_line = re.sub(r'<br\s*/>\s*({#.*}?\s*)$', r'\1', line)
-        # Remove <br /> at the end of list items
-        elif re.match(r'^\s*[-*+]\s.*<br\s*/>\s*$', line) or re.match(r'^\s*\d+\.\s.*<br\s*/>\s*$', line):
-            cleaned_line = re.sub(r'<br\s*/>\s*$', '', line)
-        # Remove <br /> at the end of lines if the next line is empty
-        elif line.endswith('<br />') or line.endswith('<br/>'):
-            next_line_empty = (i + 1 >= len(lines)) or (i + 1 < len(lines) and not lines[i + 1].strip())
-            if next_line_empty:
-                cleaned_line = re.sub(r'<br\s*/>\s*$', '', line)
-        cleaned_lines.append(cleaned_line)
-    return '\n'.join(cleaned_lines)
+    # Normalize every line boundary to '\n' so the multiline patterns see the same lines splitlines() would
+    content = '\n'.join(content.splitlines())
+    # Every pattern below needs a <br, documents without soft line breaks are done here
+    if '<br' not in content:
+        return content
+    # Remove <br /> at the end of lines if the next line is empty (headers and list items are handled below)
+    content = _BR_BEFORE_BLANK_RE.sub(_remove_br_before_blank, content)
+    # Remove <br /> after headers
+    content = _HEADER_BR_RE.sub(r'\1\2', content)
+    # Remove <br /> at the end of list items
+    content = _LIST_ITEM_BR_RE.sub(r'\1', content)
+    return content
+
+
+def _remove_br_before_blank(match) -> str:
+    """re.sub callback for _BR_BEFORE_BLANK_RE: drop the <br /> unless its line is a header or list item"""
+    text = match.string
+    line_start = text.rfind('\n', 0, match.start()) + 1
+    if _LIST_ITEM_LINE_START_RE.match(text, line_start) or _HEADER_BR_LINE_START_RE.match(text, line_start):
+        return match.group()
+    return ''
 
 
 def join_markdown_lines_smart(md_lines: list) -> str:
@@ -77,19 +116,30 @@ def join_markdown_lines_smart(md_lines: list) -> str:
     if not md_lines:
         return ""
 
-    cleaned_lines = [clean_line_breaks_at_end(line) for line in md_lines]
+    # Lines are cleaned as they are consumed, so no second full-size copy of md_lines is built
     result_lines = []
+    prev_line = None
     prev_line_is_list = False
-
-    for i, line in enumerate(cleaned_lines):
+    in_fence = False
+
+    for raw_line in md_lines:
+        if in_fence:
+            # Code block contents (and the closing fence) are kept verbatim: no stripping, no spacing
+            result_lines.append(raw_line)
+            if raw_line.strip() == '```':
+                in_fence = False
+                prev_line = raw_line
+                prev_line_is_list = False
+            continue
+        line = clean_line_breaks_at_end(raw_line)
         current_line_is_list = is_list_item(line)
-        if i == 0:
-            result_lines.append(line)
-        else:
-            if should_add_empty_line(cleaned_lines[i - 1], line, prev_line_is_list, current_line_is_list):
-                result_lines.append("")
-            result_lines.append(line)
+        if prev_line is not None and should_add_empty_line(prev_line, line, prev_line_is_list,
+                                                           current_line_is_list):
+            result_lines.append("")
+        result_lines.append(line)
+        prev_line = line
         prev_line_is_list = current_line_is_list
+        in_fence = line == '```'
     return '\n'.join(result_lines)
 
 
@@ -98,7 +148,11 @@ def ensure_proper_code_block_spacing(content: str) -> str:
     Ensure proper spacing around code blocks
     (Original logic copied)
     """
-    lines = content.splitlines()
+    return '\n'.join(_space_code_blocks(content.splitlines()))
+
+
+def _space_code_blocks(lines: list) -> list:
+    """Line-level body of ensure_proper_code_block_spacing"""
     processed_lines = []
     in_code_block = False
     i = 0
@@ -119,16 +173,21 @@ def ensure_proper_code_block_spacing(content: str) -> str:
                     if next_line.strip() != "" and next_line.strip() != "```":
                         processed_lines.append("")  # Add empty line after closing
         i += 1
-    return '\n'.join(processed_lines)
+    return processed_lines
 
 
 def is_list_item(line: str) -> bool:
     """Checks if a line is a list item"""
     # (Original logic copied)
-    if re.match(r'^\s*\d+\.\s', line):
-        return True
-    if re.match(r'^\s*[-*+]\s', line):
-        return True
+    # Most lines are decided by their first non-blank character, without entering the regex engine
+    stripped = line.lstrip()
+    if not stripped:
+        return False
+    first_char = stripped[0]
+    if first_char in '-*+':
+        return stripped[1:2].isspace()
+    if first_char.isdecimal():
+        return _NUMBERED_MARKER_RE.match(stripped) is not None
     return False
 
 
@@ -137,19 +196,8 @@ def should_add_empty_line(prev_line, current_line, prev_is_list, current_is_list
     Determines if an empty line should be added between elements
     (Original logic copied)
     """
-    if prev_is_list and current_is_list:
-        return False
-    if prev_is_list and not current_is_list:
-        return True
-    if not prev_is_list and current_is_list:
-        return True
-    if current_line.strip().startswith('#'):
-        return True
-    if current_line.strip().startswith('<table>'):
-        return True
-    if current_line.strip() == '```':
-        return True
-    return True
+    # Only consecutive list items stay together; headers, tables, fences and everything else are separated
+    return not (prev_is_list and current_is_list)
 
 
 def clean_line_breaks_at_end(text: str) -> str:
@@ -159,5 +207,5 @@ def clean_line_breaks_at_end(text: str) -> str:
     """
     if not text:
         return text
-    text = re.sub(r'<br\s*/>\s*$', '', text.strip())
+    text = _TRAILING_BR_RE.sub('', text.strip())
     return text
\ No newline at end of file
@@ -6,23 +6,11 @@ from .images import process_inline_image_sync
 
 logger = logging.getLogger(__name__)
 
+# Filler for missing cells in short rows; shared, so it must never be mutated
+_EMPTY_CELL = {'content': []}
 
-def format_paragraphs(paragraphs):
-    """Format paragraphs with proper <p> tags"""
-    # (Original logic copied)
-    if not paragraphs:
-        return []
-    formatted_paragraphs = []
-    if len(paragraphs) == 1 and len(paragraphs[0]) < 100:
-        formatted_paragraphs.append(paragraphs[0])
-    else:
-        for para in paragraphs:
-            if para.strip():
-                formatted_paragraphs.append(f"<p>{para}</p>")
-    return formatted_paragraphs
-
-
-def process_cell_content(cell, inline_objects, images_dir, img_count_ref, bookmarks, headers, lists, config: Config,
+
+def process_cell_content(cell, inline_objects, images_dir, img_counter, bookmarks, headers, lists, config: Config,
                          is_header, image_prefix=None, table_image_map=None, image_download_map=None):
     """
     FIXED cell content processing
@@ -31,7 +19,9 @@ def process_cell_content(cell, inline_objects, images_dir, img_count_ref, bookma
     cell_elements = []
     current_list_type = None
     list_items = []
+    # Stripped, non-empty paragraph texts; a single short one is emitted bare, otherwise each gets <p> tags
     paragraphs = []
+    list_types = {}  # (list_id, nesting_level) -> 'ordered' / 'unordered'
 
     for cell_content in cell.get('content', []):
         if 'paragraph' in cell_content:
@@ -40,18 +30,25 @@ def process_cell_content(cell, inline_objects, images_dir, img_count_ref, bookma
 
             if bullet:
                 if paragraphs:
-                    cell_elements.extend(format_paragraphs(paragraphs))
+                    if len(paragraphs) == 1 and len(paragraphs[0]) < 100:
+                        cell_elements.append(paragraphs[0])
+                    else:
+                        cell_elements.extend(f"<p>{para}</p>" for para in paragraphs)
                     paragraphs = []
 
                 list_id = bullet['listId']
                 nesting_level = bullet.get('nestingLevel', 0)
-                list_type = 'unordered'
-                if lists and list_id in lists:
-                    list_props = lists[list_id]['listProperties']
-                    is_ordered = is_ordered_list(list_props, nesting_level)
-                    list_type = 'ordered' if is_ordered else 'unordered'
-
-                item_text = ""
+                list_key = (list_id, nesting_level)
+                list_type = list_types.get(list_key)
+                if list_type is None:
+                    list_type = 'unordered'
+                    if lists and list_id in lists:
+                        list_props = lists[list_id]['listProperties']
+                        is_ordered = is_ordered_list(list_props, nesting_level)
+                        list_type = 'ordered' if is_ordered else 'unordered'
+                    list_types[list_key] = list_type
+
+                item_parts = []
                 for elem in para.get('elements', []):
                     if 'inlineObjectElement' in elem:
                         if table_image_map and image_download_map:
@@ -59,16 +56,18 @@ def process_cell_content(cell, inline_objects, images_dir, img_count_ref, bookma
                             if object_id in table_image_map:
                                 img_filename, img_tag = table_image_map[object_id]
                                 if image_download_map.get(img_filename, False):
-                                    item_text += img_tag
+                                    item_parts.append(img_tag)
                         else:
-                            item_text += process_inline_image_sync(elem, inline_objects, images_dir, img_count_ref,
-                                                                   config, image_prefix)  # Pass config
+                            item_parts.append(process_inline_image_sync(elem, inline_objects, images_dir,
+                                                                        img_counter, config,
+                                                                        image_prefix))  # Pass config
                     elif 'textRun' in elem:
-                        item_text += process_text_run_enhanced_for_table(elem['textRun'], bookmarks, headers, config,
-                                                                         is_header)  # Pass config
-                item_text = item_text.strip()
+                        item_parts.append(process_text_run_enhanced_for_table(elem['textRun'], bookmarks, headers,
+                                                                              config, is_header))  # Pass config
+                item_text = ''.join(item_parts).strip()
 
-                if current_list_type != list_type or current_list_type is None:
+                # list_type is never None, so this also covers the first list in the cell
+                if current_list_type != list_type:
                     if current_list_type and list_items:
                         cell_elements.append(build_list_html_fixed(current_list_type, list_items))
                         list_items = []
@@ -82,7 +81,7 @@ def process_cell_content(cell, inline_objects, images_dir, img_count_ref, bookma
                     list_items = []
                     current_list_type = None
 
-                para_text = ""
+                para_parts = []
                 for elem in para.get('elements', []):
                     if 'inlineObjectElement' in elem:
                         if table_image_map and image_download_map:
@@ -90,29 +89,33 @@ def process_cell_content(cell, inline_objects, images_dir, img_count_ref, bookma
                             if object_id in table_image_map:
                                 img_filename, img_tag = table_image_map[object_id]
                                 if image_download_map.get(img_filename, False):
-                                    para_text += img_tag
+                                    para_parts.append(img_tag)
                         else:
-                            para_text += process_inline_image_sync(elem, inline_objects, images_dir, img_count_ref,
-                                                                   config, image_prefix)  # Pass config
+                            para_parts.append(process_inline_image_sync(elem, inline_objects, images_dir,
+                                                                        img_counter, config,
+                                                                        image_prefix))  # Pass config
                     elif 'textRun' in elem:
-                        para_text += process_text_run_enhanced_for_table(elem['textRun'], bookmarks, headers, config,
-                                                                         is_header)  # Pass config
+                        para_parts.append(process_text_run_enhanced_for_table(elem['textRun'], bookmarks, headers,
+                                                                              config, is_header))  # Pass config
 
-                para_text = para_text.strip()
+                para_text = ''.join(para_parts).strip()
                 if para_text:
                     paragraphs.append(para_text)
 
     if current_list_type and list_items:
         cell_elements.append(build_list_html_fixed(current_list_type, list_items))
     if paragraphs:
-        cell_elements.extend(format_paragraphs(paragraphs))
+        if len(paragraphs) == 1 and len(paragraphs[0]) < 100:
+            cell_elements.append(paragraphs[0])
+        else:
+            cell_elements.extend(f"<p>{para}</p>" for para in paragraphs)
 
     cell_html = ''.join(cell_elements) if cell_elements else ''
     cell_html = escape_html_content(cell_html)
     return cell_html
 
 
-def table_to_markdown(table, inline_objects, images_dir, img_count_ref, bookmarks, headers, lists, config: Config,
+def table_to_markdown(table, inline_objects, images_dir, img_counter, bookmarks, headers, lists, config: Config,
                       image_prefix=None, table_image_map=None, image_download_map=None):
     """
     Convert Google Docs table to HTML format
@@ -140,66 +143,61 @@ def table_to_markdown(table, inline_objects, images_dir, img_count_ref, bookmark
         cell_contents.append(row_contents)
         raw_cells.append(row_cells)
 
-    max_cols = max(len(row) for row in cell_contents) if cell_contents else 0
-    for i, row in enumerate(cell_contents):
-        while len(row) < max_cols:
-            row.append('')
-            if i < len(raw_cells):
-                raw_cells[i].append({'content': []})
+    max_cols = max(map(len, cell_contents), default=0)
+    for row, row_cells in zip(cell_contents, raw_cells):
+        missing = max_cols - len(row)
+        if missing:
+            row.extend([''] * missing)
+            row_cells.extend([_EMPTY_CELL] * missing)
 
     spans = detect_corrected_spans(cell_contents)
+    skipped_cells = get_spanned_cells(spans)
     html_lines.append('<table>')
 
-    for row_idx in range(len(cell_contents)):
-        html_lines.append('  <tr>')
+    # Every row is padded to max_cols above, so raw_cells can be walked directly
+    for row_idx, row_cells in enumerate(raw_cells):
+        row_lines = ['  <tr>']
         is_header_row = (row_idx == 0)
         cell_tag = 'th' if is_header_row else 'td'
-        col_idx = 0
 
-        while col_idx < max_cols:
-            if should_skip_cell(row_idx, col_idx, spans):
-                col_idx += 1
+        for col_idx, cell in enumerate(row_cells):
+            if (row_idx, col_idx) in skipped_cells:
                 continue
 
-            if (row_idx < len(raw_cells) and col_idx < len(raw_cells[row_idx]) and
-                    col_idx < len(cell_contents[row_idx])):
-
-                cell = raw_cells[row_idx][col_idx]
+            cell_html = process_cell_content(
+                cell, inline_objects, images_dir, img_counter,
+                bookmarks, headers, lists, config, is_header_row, image_prefix,  # Pass config
+                table_image_map, image_download_map
+            )
 
-                cell_html = process_cell_content(
-                    cell, inline_objects, images_dir, img_count_ref,
-                    bookmarks, headers, lists, config, is_header_row, image_prefix,  # Pass config
-                    table_image_map, image_download_map
-                )
+            cell_attrs = []
+            span_info = spans.get((row_idx, col_idx))
+            if span_info:
+                row_span, col_span = span_info
+                if col_span > 1:
+                    cell_attrs.append(f'colspan="{col_span}"')
+                if row_span > 1:
+                    cell_attrs.append(f'rowspan="{row_span}"')
 
-                cell_attrs = []
-                span_info = spans.get((row_idx, col_idx))
-                if span_info:
-                    row_span, col_span = span_info
-                    if col_span > 1:
-                        cell_attrs.append(f'colspan="{col_span}"')
-                    if row_span > 1:
-                        cell_attrs.append(f'rowspan="{row_span}"')
+            attrs_str = ' ' + ' '.join(cell_attrs) if cell_attrs else ''
+            row_lines.append(f'    <{cell_tag}{attrs_str}>{cell_html}</{cell_tag}>')
 
-                attrs_str = ' ' + ' '.join(cell_attrs) if cell_attrs else ''
-                html_lines.append(f'    <{cell_tag}{attrs_str}>{cell_html}</{cell_tag}>')
-
-            col_idx += 1
-        html_lines.append('  </tr>')
+        row_lines.append('  </tr>')
+        html_lines.extend(row_lines)
 
     html_lines.append('</table>')
     return '\n'.join(html_lines)
 
 
-def should_skip_cell(row_idx, col_idx, spans):
-    """Check if a cell should be skipped due to spanning"""
-    # (Original logic copied)
+def get_spanned_cells(spans):
+    """Collect the cells covered by a span (other than its origin), which must be skipped"""
+    skipped_cells = set()
     for (span_row, span_col), (row_span, col_span) in spans.items():
-        if (span_row <= row_idx < span_row + row_span and
-                span_col <= col_idx < span_col + col_span and
-                not (span_row == row_idx and span_col == col_idx)):
-            return True
-    return False
+        for row_idx in range(span_row, span_row + row_span):
+            for col_idx in range(span_col, span_col + col_span):
+                if row_idx != span_row or col_idx != span_col:
+                    skipped_cells.add((row_idx, col_idx))
+    return skipped_cells
 
 
 def detect_corrected_spans(cell_contents):
@@ -213,51 +211,56 @@ def detect_corrected_spans(cell_contents):
     if cols == 0:
         return spans
 
+    # Cells are tested for content many times over, so strip each one only once
+    nonempty = [[bool(cell.strip()) for cell in row] for row in cell_contents]
+
     # (Original logic copied...)
     # Phase 1: Detect colspan
     for row_idx in range(rows):
-        col_idx = 0
-        while col_idx < cols:
-            cell_content = cell_contents[row_idx][col_idx]
-            if cell_content.strip():
+        row = cell_contents[row_idx]
+        row_nonempty = nonempty[row_idx]
+        next_row_nonempty = nonempty[row_idx + 1] if row_idx + 1 < rows else None
+        for col_idx in range(cols):
+            if row_nonempty[col_idx]:
                 colspan = 1
                 next_col = col_idx + 1
-                while next_col < cols and not cell_contents[row_idx][next_col].strip():
-                    if (row_idx + 1 < rows and cell_contents[row_idx + 1][next_col].strip()):
+                while next_col < cols and not row_nonempty[next_col]:
+                    if next_row_nonempty is not None and next_row_nonempty[next_col]:
                         break
                     colspan += 1
                     next_col += 1
 
-                if colspan == 1 and row_idx + 1 < rows:
+                if colspan == 1 and next_row_nonempty is not None:
                     temp_colspan = 1
                     temp_next_col = col_idx + 1
                     while (temp_next_col < cols and
-                           not cell_contents[row_idx][temp_next_col].strip() and
-                           cell_contents[row_idx + 1][temp_next_col].strip()):
+                           not row_nonempty[temp_next_col] and
+                           next_row_nonempty[temp_next_col]):
                         temp_colspan += 1
                         temp_next_col += 1
                     if temp_colspan > colspan:
                         colspan = temp_colspan
 
+                cell_content = row[col_idx]
                 if colspan > 1 and (len(cell_content) > 2 or cell_content.lower() in ['player', 'type', 'description']):
                     spans[(row_idx, col_idx)] = (1, colspan)
-            col_idx += 1
 
     # Phase 2: Detect rowspan
     for col_idx in range(cols):
         row_idx = 0
         while row_idx < rows:
-            cell_content = cell_contents[row_idx][col_idx]
-            if cell_content.strip():
+            if nonempty[row_idx][col_idx]:
+                cell_content = cell_contents[row_idx][col_idx]
                 existing_span = spans.get((row_idx, col_idx))
                 current_rowspan, colspan = existing_span if existing_span else (1, 1)
 
                 rowspan = 1
                 next_row = row_idx + 1
-                while next_row < rows and not cell_contents[next_row][col_idx].strip():
+                while next_row < rows and not nonempty[next_row][col_idx]:
+                    next_row_nonempty = nonempty[next_row]
                     has_content_right = False
                     for check_col in range(col_idx + 1, min(col_idx + colspan, cols)):
-                        if cell_contents[next_row][check_col].strip():
+                        if next_row_nonempty[check_col]:
                             has_content_right = True
                             break
                     if has_content_right:
@@ -268,10 +271,11 @@ def detect_corrected_spans(cell_contents):
                 if rowspan == 1:
                     temp_rowspan = 1
                     temp_next_row = row_idx + 1
-                    while (temp_next_row < rows and not cell_contents[temp_next_row][col_idx].strip()):
+                    while (temp_next_row < rows and not nonempty[temp_next_row][col_idx]):
+                        temp_row_nonempty = nonempty[temp_next_row]
                         section_empty = True
                         for check_col in range(col_idx, min(col_idx + colspan, cols)):
-                            if cell_contents[temp_next_row][check_col].strip():
+                            if temp_row_nonempty[check_col]:
                                 section_empty = False
                                 break
                         if section_empty:
@@ -292,15 +296,15 @@ def detect_corrected_spans(cell_contents):
     # (Phases 3 and 4 from original...)
     if rows >= 2:
         for col_idx in range(cols):
-            if (col_idx < len(cell_contents[0]) and cell_contents[0][col_idx].strip()):
+            if (col_idx < len(cell_contents[0]) and nonempty[0][col_idx]):
                 empty_count = 0
                 check_col = col_idx + 1
                 while (check_col < cols and
                        check_col < len(cell_contents[0]) and
-                       not cell_contents[0][check_col].strip()):
+                       not nonempty[0][check_col]):
                     if (1 < len(cell_contents) and
                             check_col < len(cell_contents[1]) and
-                            cell_contents[1][check_col].strip()):
+                            nonempty[1][check_col]):
                         empty_count += 1
                     check_col += 1
                 if empty_count > 0:
@@ -309,17 +313,17 @@ def detect_corrected_spans(cell_contents):
                         spans[(0, col_idx)] = (1, total_span)
     if rows >= 3:
         for col_idx in range(min(3, cols)):
-            if (cell_contents[0][col_idx].strip() and len(cell_contents[0][col_idx]) > 3):
+            if (nonempty[0][col_idx] and len(cell_contents[0][col_idx]) > 3):
                 empty_rows = 0
                 for check_row in range(1, min(rows, 4)):
-                    if not cell_contents[check_row][col_idx].strip():
+                    if not nonempty[check_row][col_idx]:
                         empty_rows += 1
                     else:
                         break
                 if empty_rows > 0 and empty_rows < rows - 1:
                     has_content_below = False
                     for check_row in range(empty_rows + 1, rows):
-                        if cell_contents[check_row][col_idx].strip():
+                        if nonempty[check_row][col_idx]:
                             has_content_below = True
                             break
                     if has_content_below:
@@ -1,9 +1,25 @@
 import re
+import html
 import logging
 from ..config import Config
+from ..utils import slugify
 
 logger = logging.getLogger(__name__)
 
+# Line breaks at the start or end of a text run
+_BR_TRIM_RE = re.compile(r'^(?:<br\s*/?>)+|(?:<br\s*/?>)+$')
+
+# Intentional HTML kept as-is by escape_html_content; whole elements are tried before bare tags
+_PRESERVE_TAG_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in (
+    r'<br\s*/?>', r'<img[^>]+>', r'<a[^>]+>.*?</a>',
+    r'<strong>.*?</strong>', r'<em>.*?</em>', r'<u>.*?</u>', r'<del>.*?</del>',
+    r'<code>.*?</code>', r'<p>.*?</p>', r'<ul>.*?</ul>', r'<ol>.*?</ol>',
+    r'<li>.*?</li>', r'<a[^>]+>', r'</a>', r'<strong>', r'</strong>',
+    r'<em>', r'</em>', r'<u>', r'</u>', r'<del>', r'</del>',
+    r'<code>', r'</code>', r'<p>', r'</p>', r'<ul>', r'</ul>',
+    r'<ol>', r'</ol>', r'<li>', r'</li>'
+)), re.IGNORECASE | re.DOTALL)
+
 
 def process_text_run_enhanced(text_run, bookmarks, headers, config: Config):
     """
@@ -15,75 +31,41 @@ def process_text_run_enhanced(text_run, bookmarks, headers, config: Config):
         return text
 
     style = text_run.get('textStyle', {})
+    if not style:
+        # Plain run: no inline code, wrappers or link to apply
+        return process_line_breaks_in_text(text).replace('\u00A0', ' ')
 
-    # Check for #d9d9d9 background for inline code
-    background_color = style.get('backgroundColor', {})
-    if background_color:
-        rgb = background_color.get('color', {}).get('rgbColor', {})
-        if rgb:
-            red = rgb.get('red', 0)
-            green = rgb.get('green', 0)
-            blue = rgb.get('blue', 0)
-
-            target_value = config.inline_code_rgb  # Use config
-            tolerance = config.inline_code_tolerance  # Use config
-
-            is_d9d9d9_gray_background = (
-                    abs(red - target_value) < tolerance and
-                    abs(green - target_value) < tolerance and
-                    abs(blue - target_value) < tolerance and
-                    red > 0.5 and green > 0.5 and blue > 0.5
-            )
-
-            if is_d9d9d9_gray_background:
-                processed_text = process_line_breaks_in_text(text)
-                return f"`{processed_text.strip()}`"
-
-        # Fallback for any light gray background
-        if rgb:
-            red = float(rgb.get('red', 0))
-            green = float(rgb.get('green', 0))
-            blue = float(rgb.get('blue', 0))
-            avg_rgb = (red + green + blue) / 3
-            max_diff = max(abs(red - avg_rgb), abs(green - avg_rgb), abs(blue - avg_rgb))
-            if max_diff < 0.1 and 0.7 < avg_rgb < 0.95:
-                processed_text = process_line_breaks_in_text(text)
-                return f"`{processed_text.strip()}`"
+    # Gray (#d9d9d9) background marks inline code
+    if is_inline_code_background(style, config):
+        processed_text = process_line_breaks_in_text(text)
+        return f"`{processed_text.strip()}`"
 
     text = process_line_breaks_in_text(text)
+    # Every wrapper yields an already-stripped string, so stripping once up front is enough
+    stripped = text.strip()
+    is_bold = style.get('bold')
+    is_italic = style.get('italic')
+    link = style.get('link')
 
     if style.get('strikethrough'):
-        text = f"~~{text.strip()}~~"
+        text = stripped = f"~~{stripped}~~"
     elif style.get('underline'):
-        text = f"<u>{text.strip()}</u>"
+        text = stripped = f"<u>{stripped}</u>"
 
-    if style.get('bold') and style.get('italic'):
-        text = f"***{text.strip()}***"
-    elif style.get('bold'):
-        text = f"**{text.strip()}**"
-    elif style.get('italic'):
-        text = f"*{text.strip()}*"
+    if is_bold and is_italic:
+        text = stripped = f"***{stripped}***"
+    elif is_bold:
+        text = stripped = f"**{stripped}**"
+    elif is_italic:
+        text = stripped = f"*{stripped}*"
 
-    if 'link' in style:
-        link = style['link']
+    if link is not None:
         url = link.get('url')
-        bookmark_id = link.get('bookmarkId')
-        heading_id = link.get('headingId')
-
         if url:
-            return f"[{text.strip()}]({url})"
-        elif bookmark_id and bookmark_id in bookmarks:
-            return f"[{text.strip()}](#{bookmarks[bookmark_id]})"
-        elif heading_id:
-            for header_text, slug in headers.items():
-                if heading_id in header_text or header_text in text:
-                    return f"[{text.strip()}](#{slug})"
-            slug = ''.join(c for c in heading_id.lower().replace('_', '-').replace(' ', '-') if c.isalnum() or c == '-')
-            return f"[{text.strip()}](#{slug})"
-        else:
-            for header_text, slug in headers.items():
-                if text.strip().lower() in header_text.lower():
-                    return f"[{text.strip()}](#{slug})"
+            return f"[{stripped}]({url})"
+        anchor = find_link_anchor(link, text, bookmarks, headers)
+        if anchor is not None:
+            return f"[{stripped}](#{anchor})"
 
     return text.replace('\u00A0', ' ')
 
@@ -98,76 +80,99 @@ def process_text_run_enhanced_for_table(text_run, bookmarks, headers, config: Co
         return text
 
     style = text_run.get('textStyle', {})
+    if not style:
+        return escape_html_text(process_line_breaks_in_text(text).strip()).replace('\u00A0', ' ')
 
-    background_color = style.get('backgroundColor', {})
-    if background_color:
-        rgb = background_color.get('color', {}).get('rgbColor', {})
-        if rgb:
-            red = rgb.get('red', 0)
-            green = rgb.get('green', 0)
-            blue = rgb.get('blue', 0)
-
-            target_value = config.inline_code_rgb  # Use config
-            tolerance = config.inline_code_tolerance  # Use config
-
-            is_d9d9d9_gray_background = (
-                    abs(red - target_value) < tolerance and
-                    abs(green - target_value) < tolerance and
-                    abs(blue - target_value) < tolerance
-            )
-            if is_d9d9d9_gray_background:
-                processed_text = process_line_breaks_in_text(text)
-                return f"`{processed_text.strip()}`"
-
-        if rgb:
-            red = float(rgb.get('red', 0))
-            green = float(rgb.get('green', 0))
-            blue = float(rgb.get('blue', 0))
-            avg_rgb = (red + green + blue) / 3
-            max_diff = max(abs(red - avg_rgb), abs(green - avg_rgb), abs(blue - avg_rgb))
-            if max_diff < 0.1 and 0.7 < avg_rgb < 0.95:
-                processed_text = process_line_breaks_in_text(text)
-                return f"`{processed_text.strip()}`"
+    if is_inline_code_background(style, config, require_light=False):
+        processed_text = process_line_breaks_in_text(text)
+        return f"`{processed_text.strip()}`"
 
     text = process_line_breaks_in_text(text)
+    escaped = escape_html_text(text.strip())
 
-    if 'link' in style:
-        link = style['link']
+    link = style.get('link')
+    if link is not None:
         url = link.get('url')
-        bookmark_id = link.get('bookmarkId')
-        heading_id = link.get('headingId')
         if url:
-            return f' <a href="{escape_html_attribute(url)}">{escape_html_text(text.strip())}</a>'
-        elif bookmark_id and bookmark_id in bookmarks:
-            return f' <a href="#{bookmarks[bookmark_id]}">{escape_html_text(text.strip())}</a>'
-        elif heading_id:
-            for header_text, slug in headers.items():
-                if heading_id in header_text or header_text in text:
-                    return f' <a href="#{slug}">{escape_html_text(text.strip())}</a>'
-            slug = ''.join(c for c in heading_id.lower().replace('_', '-').replace(' ', '-') if c.isalnum() or c == '-')
-            return f' <a href="#{slug}">{escape_html_text(text.strip())}</a>'
-        else:
-            for header_text, slug in headers.items():
-                if text.strip().lower() in header_text.lower():
-                    return f' <a href="#{slug}">{escape_html_text(text.strip())}</a>'
+            return f' <a href="{escape_html_attribute(url)}">{escaped}</a>'
+        anchor = find_link_anchor(link, text, bookmarks, headers)
+        if anchor is not None:
+            return f' <a href="#{anchor}">{escaped}</a>'
 
+    is_bold = style.get('bold')
+    is_italic = style.get('italic')
     if style.get('strikethrough'):
-        text = f"<del>{escape_html_text(text.strip())}</del>"
+        text = f"<del>{escaped}</del>"
     elif style.get('underline'):
-        text = f"<u>{escape_html_text(text.strip())}</u>"
+        text = f"<u>{escaped}</u>"
     else:
-        if style.get('bold') and style.get('italic'):
-            text = f"<em>{escape_html_text(text.strip())}" if is_header else f"<strong><em>{escape_html_text(text.strip())}</em></strong>"
-        elif style.get('bold'):
-            text = escape_html_text(text.strip()) if is_header else f"<strong>{escape_html_text(text.strip())}</strong>"
-        elif style.get('italic'):
-            text = f"<em>{escape_html_text(text.strip())}</em>"
+        if is_bold and is_italic:
+            text = f"<em>{escaped}" if is_header else f"<strong><em>{escaped}</em></strong>"
+        elif is_bold:
+            text = escaped if is_header else f"<strong>{escaped}</strong>"
+        elif is_italic:
+            text = f"<em>{escaped}</em>"
         else:
-            text = escape_html_text(text.strip())
+            text = escaped
 
     return text.replace('\u00A0', ' ')
 
 
+def is_inline_code_background(style, config: Config, require_light=True) -> bool:
+    """
+    Check whether a text style has the gray background used to mark inline code:
+    close to the configured #d9d9d9 gray, or any other light neutral gray.
+    require_light additionally requires every channel of the configured-gray match to be > 0.5.
+    """
+    rgb = style.get('backgroundColor', {}).get('color', {}).get('rgbColor', {})
+    if not rgb:
+        return False
+
+    red = float(rgb.get('red', 0))
+    green = float(rgb.get('green', 0))
+    blue = float(rgb.get('blue', 0))
+
+    target_value = config.inline_code_rgb  # Use config
+    tolerance = config.inline_code_tolerance  # Use config
+    if (abs(red - target_value) < tolerance and
+            abs(green - target_value) < tolerance and
+            abs(blue - target_value) < tolerance and
+            (not require_light or (red > 0.5 and green > 0.5 and blue > 0.5))):
+        return True
+
+    # Fallback for any light gray background
+    avg_rgb = (red + green + blue) / 3
+    max_diff = max(abs(red - avg_rgb), abs(green - avg_rgb), abs(blue - avg_rgb))
+    return max_diff < 0.1 and 0.7 < avg_rgb < 0.95
+
+
+def find_link_anchor(link, text, bookmarks, headers):
+    """
+    Resolve the anchor slug an internal (bookmark or heading) link points to.
+    Returns None if the link doesn't match any bookmark or header.
+    """
+    bookmark_id = link.get('bookmarkId')
+    heading_id = link.get('headingId')
+
+    if bookmark_id and bookmark_id in bookmarks:
+        return bookmarks[bookmark_id]
+    elif heading_id:
+        # Headings are indexed by their headingId, the header scan is only a fallback
+        if heading_id in bookmarks:
+            return bookmarks[heading_id]
+        for header_text, slug in headers.items():
+            if heading_id in header_text or header_text in text:
+                return slug
+        return slugify(heading_id)
+    else:
+        # Link without a target: match the link text against the document's headers
+        link_text = text.strip().lower()
+        for header_text, slug in headers.items():
+            if link_text in header_text.lower():
+                return slug
+    return None
+
+
 def process_line_breaks_in_text(text: str) -> str:
     """
     NEW FUNCTION: Correctly handle soft line breaks
@@ -175,40 +180,31 @@ def process_line_breaks_in_text(text: str) -> str:
     """
     if not text:
         return text
-    if text.strip().replace('\n', '').strip() == '':
+    if not text.strip():
         return ''
+    # Most runs have no soft breaks at all
+    if '\n' not in text and '<br' not in text:
+        return text
     text = text.replace('\n', '<br />')
-    text = re.sub(r'^(<br\s*/?>)+', '', text)
-    text = re.sub(r'(<br\s*/?>)+$', '', text)
+    # Only scan when a break can actually sit at either end
+    if text.startswith('<br') or text.endswith('>'):
+        text = _BR_TRIM_RE.sub('', text)
     return text
 
 
 def escape_html_text(text: str) -> str:
     """Escape HTML special characters in text content"""
-    # (Original logic copied)
+    # html.escape(quote=True) produces the same &amp; &lt; &gt; &quot; &#x27; entities
     if not text:
         return text
-    text = str(text)
-    text = text.replace('&', '&amp;')
-    text = text.replace('<', '&lt;')
-    text = text.replace('>', '&gt;')
-    text = text.replace('"', '&quot;')
-    text = text.replace("'", '&#x27;')
-    return text
+    return html.escape(str(text), quote=True)
 
 
 def escape_html_attribute(attr: str) -> str:
     """Escape HTML special characters in attribute values"""
-    # (Original logic copied)
     if not attr:
         return attr
-    attr = str(attr)
-    attr = attr.replace('&', '&amp;')
-    attr = attr.replace('<', '&lt;')
-    attr = attr.replace('>', '&gt;')
-    attr = attr.replace('"', '&quot;')
-    attr = attr.replace("'", '&#x27;')
-    return attr
+    return html.escape(str(attr), quote=True)
 
 
 def escape_html_content(text: str) -> str:
@@ -216,31 +212,16 @@ def escape_html_content(text: str) -> str:
     Escape HTML special characters but preserve intentional HTML tags
     (Original logic copied)
     """
-    protected_tags = {}
-    tag_counter = 0
-    preserve_patterns = [
-        r'<br\s*/?>', r'<img[^>]+>', r'<a[^>]+>.*?</a>',
-        r'<strong>.*?</strong>', r'<em>.*?</em>', r'<u>.*?</u>', r'<del>.*?</del>',
-        r'<code>.*?</code>', r'<p>.*?</p>', r'<ul>.*?</ul>', r'<ol>.*?</ol>',
-        r'<li>.*?</li>', r'<a[^>]+>', r'</a>', r'<strong>', r'</strong>',
-        r'<em>', r'</em>', r'<u>', r'</u>', r'<del>', r'</del>',
-        r'<code>', r'</code>', r'<p>', r'</p>', r'<ul>', r'</ul>',
-        r'<ol>', r'</ol>', r'<li>', r'</li>'
-    ]
-    for pattern in preserve_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE | re.DOTALL)
-        for match in matches:
-            placeholder = f"__PRESERVE_TAG_{tag_counter}__"
-            protected_tags[placeholder] = match
-            text = text.replace(match, placeholder, 1)
-            tag_counter += 1
-
-    text = text.replace('&', '&amp;')
-    text = text.replace('<', '&lt;')
-    text = text.replace('>', '&gt;')
-    text = text.replace('"', '&quot;')
-    text = text.replace("'", '&#x27;')
-
-    for placeholder, original_tag in protected_tags.items():
-        text = text.replace(placeholder, original_tag)
-    return text
\ No newline at end of file
+    if '<' not in text:
+        # No tags to preserve (plain-text cells), so the whole text is a single segment
+        return escape_html_text(text)
+
+    # Single pass: escape the text between preserved tags and copy the tags through untouched
+    parts = []
+    last_end = 0
+    for match in _PRESERVE_TAG_RE.finditer(text):
+        parts.append(escape_html_text(text[last_end:match.start()]))
+        parts.append(match.group())
+        last_end = match.end()
+    parts.append(escape_html_text(text[last_end:]))
+    return ''.join(parts)
\ No newline at end of file
@@ -1,8 +1,8 @@
 import os
+import asyncio
 import logging
 import tempfile
 import shutil
-import time
 
 from .config import Config
 from .exceptions import ConfigurationError
@@ -52,68 +52,10 @@ def main(config_path: str) -> int:
 
         logger.info(f"Found {len(jobs)} documents to process")
 
-        # 5. Process each document
-        for job_index, (doc_url, remote_dir, custom_filename) in enumerate(jobs, start=1):
-            logger.info(f"\n=== Processing document {job_index}/{len(jobs)} ===")
-            logger.info(f"URL: {doc_url}")
-            logger.info(f"Remote directory: {remote_dir}")
-
-            try:
-                # Validate URL and extract ID
-                if not doc_url or not ("docs.google.com" in doc_url or len(doc_url) == 44):
-                    logger.error(f"Invalid Google Docs URL or ID: {doc_url}")
-                    continue
-
-                doc_id = extract_gdoc_id_from_url(doc_url)
-                logger.info(f"Document ID: {doc_id}")
-
-                if not doc_id or len(doc_id) < 20:
-                    logger.error(f"Could not extract valid document ID from: {doc_url}")
-                    continue
-
-                # Determine filename
-                if custom_filename and custom_filename.strip():
-                    md_filename = custom_filename.strip()
-                    if not md_filename.endswith('.md'):
-                        md_filename += '.md'
-                    image_prefix = md_filename.replace('.md', '')
-                else:
-                    title = google_services.get_document_name(doc_id, creds)
-                    md_filename = normalize_filename(title) + ".md"
-                    image_prefix = normalize_filename(title)
-
-                logger.info(f"Filename: {md_filename}")
-
-                # Create temporary directory
-                temp_dir = tempfile.mkdtemp()
-                images_dir = os.path.join(temp_dir, "images")
-                md_path = os.path.join(temp_dir, md_filename)
-
-                # --- Run conversion ---
-                # Use our async runner
-                run_async_in_thread(
-                    convert_gdoc_to_markdown_large,
-                    doc_id, md_path, images_dir, creds, config, image_prefix
-                )
-
-                # --- Upload to SFTP ---
-                remote_md_path = os.path.join(remote_dir, md_filename).replace("\\", "/")
-                sftp_client.sftp_upload_file(md_path, remote_md_path, sftp_config)
-
-                if os.path.exists(images_dir) and os.listdir(images_dir):
-                    remote_images_dir = os.path.join(remote_dir, "images").replace("\\", "/")
-                    sftp_client.sftp_upload_directory(images_dir, remote_images_dir, sftp_config)
-                    logger.info(f"Images directory uploaded to {remote_images_dir}")
-
-                logger.info(f"✅ Document {job_index} processed successfully")
-
-                # Clean up
-                shutil.rmtree(temp_dir)
-                time.sleep(2)  # Pause between documents
-
-            except Exception as e:
-                logger.error(f"❌ Failed to process document {job_index} ({doc_url}): {e}", exc_info=True)
-                continue
+        # 5. Process the documents, several at a time, over one SFTP connection.
+        # The connection is only made at the first upload, so SFTP trouble never stops the conversions
+        with sftp_client.sftp_session(sftp_config) as sftp_session:
+            run_async_in_thread(process_jobs, jobs, config, creds, sftp_session)
 
         logger.info("=== Batch processing complete! ===")
 
@@ -124,4 +66,85 @@ def main(config_path: str) -> int:
         logger.critical(f"Unexpected error: {e}", exc_info=True)
         return 1
 
-    return 0
\ No newline at end of file
+    return 0
+
+
+async def process_jobs(jobs: list, config: Config, creds, sftp_session):
+    """
+    Process all documents, up to config.max_concurrent_documents of them at once.
+    All conversions share this one event loop; only the blocking calls go to worker threads.
+    """
+    semaphore = asyncio.Semaphore(config.max_concurrent_documents)
+
+    async def run_job(job_index, job):
+        async with semaphore:
+            await process_job(job_index, len(jobs), job, config, creds, sftp_session)
+
+    await asyncio.gather(*(run_job(job_index, job) for job_index, job in enumerate(jobs, start=1)))
+
+
+async def process_job(job_index: int, job_count: int, job: tuple, config: Config, creds, sftp_session):
+    """Convert one document and upload it with its images. Errors are logged, not raised."""
+    doc_url, remote_dir, custom_filename = job
+    logger.info(f"\n=== Processing document {job_index}/{job_count} ===")
+    logger.info(f"URL: {doc_url}")
+    logger.info(f"Remote directory: {remote_dir}")
+
+    try:
+        # Validate URL and extract ID
+        if not doc_url or not ("docs.google.com" in doc_url or len(doc_url) == 44):
+            logger.error(f"Invalid Google Docs URL or ID: {doc_url}")
+            return
+
+        doc_id = extract_gdoc_id_from_url(doc_url)
+        logger.info(f"Document ID: {doc_id}")
+
+        if not doc_id or len(doc_id) < 20:
+            logger.error(f"Could not extract valid document ID from: {doc_url}")
+            return
+
+        # Determine filename
+        if custom_filename and custom_filename.strip():
+            md_filename = custom_filename.strip()
+            if not md_filename.endswith('.md'):
+                md_filename += '.md'
+            image_prefix = md_filename.replace('.md', '')
+        else:
+            title = await asyncio.to_thread(google_services.get_document_name, doc_id, creds)
+            md_filename = normalize_filename(title) + ".md"
+            image_prefix = normalize_filename(title)
+
+        logger.info(f"Filename: {md_filename}")
+
+        # Create temporary directory
+        temp_dir = tempfile.mkdtemp()
+        images_dir = os.path.join(temp_dir, "images")
+        md_path = os.path.join(temp_dir, md_filename)
+
+        # --- Run conversion ---
+        # Runs on the batch's event loop, no new loop per document
+        await convert_gdoc_to_markdown_large(doc_id, md_path, images_dir, creds, config, image_prefix)
+
+        # --- Upload to SFTP ---
+        await asyncio.to_thread(upload_job_files, sftp_session, md_path, md_filename, images_dir, remote_dir)
+
+        logger.info(f"✅ Document {job_index} processed successfully")
+
+        # Clean up
+        shutil.rmtree(temp_dir)
+
+    except Exception as e:
+        logger.error(f"❌ Failed to process document {job_index} ({doc_url}): {e}", exc_info=True)
+
+
+def upload_job_files(sftp_session, md_path: str, md_filename: str, images_dir: str, remote_dir: str):
+    """Upload a converted document and its images directory (blocking)"""
+    # Each job gets its own channel on the shared connection, so no SSH handshake per upload
+    with sftp_session.open_sftp() as sftp:
+        remote_md_path = os.path.join(remote_dir, md_filename).replace("\\", "/")
+        sftp_client.sftp_upload_file(md_path, remote_md_path, sftp)
+
+        if os.path.exists(images_dir) and os.listdir(images_dir):
+            remote_images_dir = os.path.join(remote_dir, "images").replace("\\", "/")
+            sftp_client.sftp_upload_directory(images_dir, remote_images_dir, sftp)
+            logger.info(f"Images directory uploaded to {remote_images_dir}")
\ No newline at end of file
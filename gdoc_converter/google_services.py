@@ -1,17 +1,51 @@
 import os
 import logging
+import threading
 from .config import Config
 from .exceptions import ConfigurationError
 from .sftp import SFTPConfig
 
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.discovery import build as build_google_sheet
+from googleapiclient.model import JsonModel
+
+try:
+    import orjson
+except ImportError:  # Optional: responses are parsed with the stdlib json module instead
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Docs API client per thread: httplib2 connections must not be shared between threads
+_thread_services = threading.local()
+
+
+class OrjsonModel(JsonModel):
+    """JsonModel that parses API responses with orjson (much faster on large documents)"""
+
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # Let the stdlib model handle non-JSON bodies the way it always has
+            return super().deserialize(content)
+        if self._data_wrapper and isinstance(body, dict) and 'data' in body:
+            body = body['data']
+        return body
+
+
+def build_docs_service(creds: Credentials):
+    """
+    Get a Google Docs API client, using orjson for responses when it is installed.
+    Built once per thread and credentials, so the discovery document isn't parsed again for every call.
+    """
+    if getattr(_thread_services, 'creds', None) is not creds:
+        model = OrjsonModel() if orjson else None
+        _thread_services.docs = build('docs', 'v1', credentials=creds, model=model)
+        _thread_services.creds = creds
+    return _thread_services.docs
+
 def get_credentials_from_sheet(config: Config, creds: Credentials) -> SFTPConfig:
     """
     Get SFTP credentials from the 'Credentials' sheet in Google Sheet
@@ -20,45 +54,45 @@ def get_credentials_from_sheet(config: Config, creds: Credentials) -> SFTPConfig
         service = build_google_sheet('sheets', 'v4', credentials=creds)
         sheet = service.spreadsheets()
 
-        # Get data from the Credentials sheet
-        result = sheet.values().get(
-            spreadsheetId=config.google_sheet_id,      # Use config
-            range=config.google_range_credentials   # Use config
+        # Get data from the Credentials sheet, column-major so B1:B4 comes back as one flat list
+        result = sheet.values().batchGet(
+            spreadsheetId=config.google_sheet_id,         # Use config
+            ranges=[config.google_range_credentials],  # Use config
+            majorDimension='COLUMNS'
         ).execute()
+    except Exception as e:
+        logger.error(f"Failed to get credentials from sheet: {e}")
+        raise ConfigurationError(f"Cannot load SFTP configuration: {e}") from e
 
-        values = result.get('values', [])
+    value_ranges = result.get('valueRanges', [])
+    columns = value_ranges[0].get('values', []) if value_ranges else []
+    values = columns[0] if columns else []
 
-        if len(values) < 4:
-            raise ConfigurationError("Insufficient data in Credentials sheet. Expected values in B1:B4")
+    if len(values) < 4:
+        raise ConfigurationError("Insufficient data in Credentials sheet. Expected values in B1:B4")
 
-        sftp_user = values[0][0] if values[0] else None
-        sftp_pass = values[1][0] if values[1] else None
-        sftp_host = values[2][0] if len(values) > 2 and values[2] else None
-        sftp_port_str = values[3][0] if len(values) > 3 and values[3] else None
+    # Empty cells in the middle of the range come back as ''
+    sftp_user, sftp_pass, sftp_host, sftp_port_str = values[:4]
 
-        if not sftp_user or not sftp_pass:
-            raise ConfigurationError("SFTP credentials are empty in Credentials sheet")
+    if not sftp_user or not sftp_pass:
+        raise ConfigurationError("SFTP credentials are empty in Credentials sheet")
 
-        if not sftp_host:
-            raise ConfigurationError("SFTP host is empty in Credentials sheet (cell B3)")
+    if not sftp_host:
+        raise ConfigurationError("SFTP host is empty in Credentials sheet (cell B3)")
 
-        if not sftp_port_str:
-            raise ConfigurationError("SFTP port is empty in Credentials sheet (cell B4)")
+    if not sftp_port_str:
+        raise ConfigurationError("SFTP port is empty in Credentials sheet (cell B4)")
 
-        try:
-            sftp_port = int(sftp_port_str)
-        except ValueError:
-            raise ConfigurationError(f"SFTP port must be a number, got: {sftp_port_str}")
-
-        sftp_config = SFTPConfig(sftp_host, sftp_port, sftp_user, sftp_pass)
-        sftp_config.validate()
+    try:
+        sftp_port = int(sftp_port_str)
+    except ValueError:
+        raise ConfigurationError(f"SFTP port must be a number, got: {sftp_port_str}")
 
-        logger.info(f"Successfully loaded SFTP configuration: {sftp_user}@{sftp_host}:{sftp_port}")
-        return sftp_config
+    sftp_config = SFTPConfig(sftp_host, sftp_port, sftp_user, sftp_pass)
+    sftp_config.validate()
 
-    except Exception as e:
-        logger.error(f"Failed to get credentials from sheet: {e}")
-        raise ConfigurationError(f"Cannot load SFTP configuration: {e}")
+    logger.info(f"Successfully loaded SFTP configuration: {sftp_user}@{sftp_host}:{sftp_port}")
+    return sftp_config
 
 
 def authenticate(config: Config) -> Credentials:
@@ -73,10 +107,13 @@ def authenticate(config: Config) -> Credentials:
             creds = Credentials.from_authorized_user_file(token_file, scopes)
 
         if not creds or not creds.valid:
+            # Only needed when the saved token can't be used as is, so imported here
             if creds and creds.expired and creds.refresh_token:
+                from google.auth.transport.requests import Request
                 logger.info("Refreshing expired credentials...")
                 creds.refresh(Request())
             else:
+                from google_auth_oauthlib.flow import InstalledAppFlow
                 logger.info("Starting local server for OAuth flow...")
                 flow = InstalledAppFlow.from_client_secrets_file(creds_file, scopes)
                 creds = flow.run_local_server(port=0)
@@ -127,10 +164,11 @@ def get_gdocs_batch_from_sheet(config: Config, creds: Credentials) -> list:
                         if doc_url and remote_dir:
                             output.append((doc_url, remote_dir, file_name))
                         else:
-                            logger.warning(f"Row {row_index}: missing URL or remote directory")
+                            # Per-row messages use %-style, so the logging layer only formats them if they are emitted
+                            logger.warning("Row %d: missing URL or remote directory", row_index)
 
             except Exception as e:
-                logger.error(f"Error processing row {row_index}: {e}")
+                logger.error("Error processing row %d: %s", row_index, e)
                 continue
 
         logger.info(f"Loaded {len(output)} documents from Links sheet")
@@ -146,7 +184,7 @@ def get_document_name(document_id: str, creds: Credentials) -> str:
     Get the title (name) of a Google Doc
     """
     try:
-        docs_service = build('docs', 'v1', credentials=creds)
+        docs_service = build_docs_service(creds)
         doc = docs_service.documents().get(documentId=document_id, fields='title').execute()
         title = doc.get('title', 'output')
         logger.debug(f"Retrieved document title: {title}")
@@ -1,10 +1,20 @@
 import os
-import paramiko
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from .exceptions import ConfigurationError
 
 logger = logging.getLogger(__name__)
 
+# Seconds between keepalive packets, so the shared connection survives long conversions between uploads
+SFTP_KEEPALIVE_INTERVAL = 30
+# SFTP channels used to upload the files of one directory in parallel. Kept low because
+# servers cap the channels per connection (OpenSSH MaxSessions defaults to 10) and jobs share the connection
+SFTP_UPLOAD_CHANNELS = 3
+# Seconds an SFTP request may wait for the server before failing, instead of hanging the job forever
+SFTP_CHANNEL_TIMEOUT = 30
+
 
 class SFTPConfig:
     """Data class for SFTP configuration"""
@@ -23,19 +33,95 @@ class SFTPConfig:
             raise ConfigurationError("SFTP port must be a positive integer")
 
 
-def sftp_upload_file(local_path: str, remote_path: str, sftp_config: SFTPConfig):
+class SFTPSession:
     """
-    Upload a single file to a remote server via SFTP
+    One SSH connection shared by all uploads of a batch.
+    Connects on the first open_sftp() and reconnects whenever the connection has dropped,
+    so an outage only fails the uploads running at that moment.
     """
-    transport = None
-    sftp = None
 
+    def __init__(self, sftp_config: SFTPConfig):
+        self.sftp_config = sftp_config
+        self._transport = None
+        self._lock = threading.Lock()
+
+    def open_sftp(self):
+        """
+        Open a new SFTP client (channel) on the shared connection, reconnecting once if the connection went down.
+        A channel refused on a live connection (e.g. the server's MaxSessions is reached) is raised as is.
+        """
+        import paramiko  # Imported lazily, paramiko/cryptography are slow to load
+
+        transport = self._get_transport()
+        try:
+            return open_sftp(transport)
+        except (paramiko.SSHException, EOFError) as e:
+            if transport.is_active():
+                # Closing a working connection would abort the uploads of every other job on it
+                raise
+            logger.warning(f"SFTP connection failed ({e})")
+            return open_sftp(self._get_transport())
+
+    def close(self):
+        """Close the shared connection, if one is open"""
+        with self._lock:
+            if self._transport is not None:
+                self._transport.close()
+                self._transport = None
+
+    def _get_transport(self):
+        """Return the live transport, connecting a new one if there is none or it is no longer active"""
+        with self._lock:
+            transport = self._transport
+            if transport is not None and not transport.is_active():
+                logger.warning("SFTP connection lost, reconnecting...")
+                transport.close()
+                transport = self._transport = None
+            if transport is None:
+                transport = self._transport = _connect(self.sftp_config)
+            return transport
+
+
+def _connect(sftp_config: SFTPConfig):
+    """Open and authenticate an SSH transport"""
+    import paramiko  # Imported lazily, paramiko/cryptography are slow to load
+
+    transport = paramiko.Transport((sftp_config.host, sftp_config.port))
     try:
-        # Establish connection
-        transport = paramiko.Transport((sftp_config.host, sftp_config.port))
         transport.connect(username=sftp_config.user, password=sftp_config.password)
-        sftp = paramiko.SFTPClient.from_transport(transport)
+    except Exception:
+        transport.close()
+        raise
+    transport.set_keepalive(SFTP_KEEPALIVE_INTERVAL)
+    logger.info(f"SFTP connection opened to {sftp_config.host}:{sftp_config.port}")
+    return transport
 
+
+@contextmanager
+def sftp_session(sftp_config: SFTPConfig):
+    """
+    Share one SSH connection across a whole batch of uploads.
+    Yields an SFTPSession; nothing is connected until the first upload opens a channel with open_sftp().
+    """
+    session = SFTPSession(sftp_config)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def open_sftp(transport):
+    """Open a new SFTP client (channel) on an open transport"""
+    sftp = transport.open_sftp_client()
+    sftp.get_channel().settimeout(SFTP_CHANNEL_TIMEOUT)
+    return sftp
+
+
+def sftp_upload_file(local_path: str, remote_path: str, sftp):
+    """
+    Upload a single file to a remote server via an open SFTP client
+    """
+    try:
         # Create remote directory if it doesn't exist
         remote_dir = os.path.dirname(remote_path)
         _create_remote_directory(sftp, remote_dir)
@@ -47,29 +133,19 @@ def sftp_upload_file(local_path: str, remote_path: str, sftp_config: SFTPConfig)
     except Exception as e:
         logger.error(f"SFTP upload failed for {local_path}: {e}")
         raise
-    finally:
-        if sftp:
-            sftp.close()
-        if transport:
-            transport.close()
 
 
-def sftp_upload_directory(local_dir: str, remote_dir: str, sftp_config: SFTPConfig):
+def sftp_upload_directory(local_dir: str, remote_dir: str, sftp):
     """
-    Upload an entire directory to a remote server via SFTP
+    Upload an entire directory to a remote server via an open SFTP client
     """
-    transport = None
-    sftp = None
-
     try:
-        transport = paramiko.Transport((sftp_config.host, sftp_config.port))
-        transport.connect(username=sftp_config.user, password=sftp_config.password)
-        sftp = paramiko.SFTPClient.from_transport(transport)
-
-        # Create root remote directory
-        _create_remote_directory(sftp, remote_dir)
+        # Create root remote directory. Directories known to exist are remembered, so each one is probed only once
+        created_dirs = set()
+        _create_remote_directory(sftp, remote_dir, created_dirs)
 
-        # Walk through and upload all files
+        # Walk through, creating the remote directories, and collect all files
+        uploads = []
         for root, dirs, files in os.walk(local_dir):
             for file in files:
                 local_file_path = os.path.join(root, file)
@@ -77,28 +153,60 @@ def sftp_upload_directory(local_dir: str, remote_dir: str, sftp_config: SFTPConf
                 remote_file_path = os.path.join(remote_dir, relative_path).replace("\\", "/")
 
                 remote_file_dir = os.path.dirname(remote_file_path)
-                if remote_file_dir != remote_dir:
-                    _create_remote_directory(sftp, remote_file_dir)
+                if remote_file_dir not in created_dirs:
+                    _create_remote_directory(sftp, remote_file_dir, created_dirs)
 
-                sftp.put(local_file_path, remote_file_path)
-                logger.debug(f"Uploaded file: {local_file_path} -> {remote_file_path}")
+                uploads.append((local_file_path, remote_file_path))
+
+        _put_files_parallel(sftp, uploads)
 
         logger.info(f"Directory {local_dir} uploaded successfully to {remote_dir}")
 
     except Exception as e:
         logger.error(f"SFTP directory upload failed for {local_dir}: {e}")
         raise
+
+
+def _put_files_parallel(sftp, uploads: list):
+    """
+    Upload (local_path, remote_path) pairs over several SFTP channels of the same connection,
+    so the round trips of small files overlap. sftp.put() already pipelines the writes within a file.
+    """
+    transport = sftp.get_channel().get_transport()
+    clients = [sftp]
+    try:
+        while len(clients) < min(SFTP_UPLOAD_CHANNELS, len(uploads)):
+            try:
+                clients.append(open_sftp(transport))
+            except Exception as e:
+                # The server refused another channel, upload with the ones already open
+                logger.debug(f"Could not open another SFTP channel: {e}")
+                break
+
+        def put_all(client, client_uploads):
+            for local_file_path, remote_file_path in client_uploads:
+                client.put(local_file_path, remote_file_path)
+                logger.debug(f"Uploaded file: {local_file_path} -> {remote_file_path}")
+
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            futures = [executor.submit(put_all, client, uploads[i::len(clients)])
+                       for i, client in enumerate(clients)]
+            for future in futures:
+                future.result()
     finally:
-        if sftp:
-            sftp.close()
-        if transport:
-            transport.close()
+        for client in clients[1:]:
+            client.close()
 
 
-def _create_remote_directory(sftp, remote_dir: str):
+def _create_remote_directory(sftp, remote_dir: str, created_dirs: set = None):
     """
     Recursively create a remote directory.
+    Probes with stat() rather than chdir(), so the working directory of a reused client never moves.
+    Paths in created_dirs are skipped without a round trip, and every path that now exists is added to it.
     """
+    if created_dirs is None:
+        created_dirs = set()
+
     dirs = remote_dir.strip('/').split('/')
     current_dir = ''
     if remote_dir.startswith('/'):
@@ -108,9 +216,12 @@ def _create_remote_directory(sftp, remote_dir: str):
         if not dir_name:
             continue
         current_dir = os.path.join(current_dir, dir_name).replace("\\", "/")
+        if current_dir in created_dirs:
+            continue
         try:
-            sftp.chdir(current_dir)
+            sftp.stat(current_dir)
         except IOError:
             logger.debug(f"Creating remote directory: {current_dir}")
             sftp.mkdir(current_dir)
-            sftp.chdir(current_dir)
\ No newline at end of file
+        created_dirs.add(current_dir)
+    created_dirs.add(remote_dir)
\ No newline at end of file
@@ -5,6 +5,9 @@ from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Anything that isn't a word character or '-' (\w matches exactly what str.isalnum() does, plus '_')
+_SLUG_INVALID_CHARS_RE = re.compile(r'[^\w-]')
+
 def normalize_filename(name: str) -> str:
     """
     Normalize filename: remove special characters and spaces.
@@ -15,6 +18,15 @@ def normalize_filename(name: str) -> str:
     return normalized
 
 
+def slugify(text: str) -> str:
+    """
+    Build an anchor slug: lowercase, spaces and underscores become '-',
+    all other non-alphanumeric characters are removed.
+    """
+    slug = text.lower().replace(' ', '-').replace('_', '-')
+    return _SLUG_INVALID_CHARS_RE.sub('', slug)
+
+
 def run_async_in_thread(async_func, *args):
     """
     Runs an async function.
@@ -22,27 +34,34 @@ def run_async_in_thread(async_func, *args):
     Otherwise, runs it using asyncio.run().
     """
     try:
-        loop = asyncio.get_running_loop()
-        # If loop exists, run in a separate thread to avoid blocking
-        with ThreadPoolExecutor() as executor:
-            future = executor.submit(asyncio.run, async_func(*args))
-            return future.result()
+        asyncio.get_running_loop()
+        loop_running = True
     except RuntimeError:
-        # No event loop is running, we can safely use asyncio.run()
+        loop_running = False
+
+    if not loop_running:
+        # No event loop is running (the normal CLI case), run directly without a thread
+        logger.debug(f"Running {async_func.__name__} with asyncio.run()")
         return asyncio.run(async_func(*args))
 
+    # A loop is already running in this thread and cannot be re-entered,
+    # so the coroutine needs its own loop in a worker thread
+    logger.debug(f"Event loop already running, running {async_func.__name__} in a worker thread")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(asyncio.run, async_func(*args))
+        return future.result()
+
 def extract_gdoc_id_from_url(url: str) -> str:
     """
     Extract Google Doc ID from URL.
     """
-    if "/d/" in url:
-        start = url.index("/d/") + 3
-        end = url.find("/", start)
-        if end == -1:
-            end = url.find("?", start)
-        if end == -1:
-            end = len(url)
-        return url[start:end]
+    _, sep, rest = url.partition("/d/")
+    if sep:
+        # The ID ends at the next '/', or at the '?' of the query string when no '/' follows
+        doc_id, slash, _ = rest.partition("/")
+        if not slash:
+            doc_id = doc_id.partition("?")[0]
+        return doc_id
     # If it's already an ID
     if len(url) == 44 and not url.startswith("http"):
         return url